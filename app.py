@@ -4,28 +4,51 @@
 
 import json
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort
+from flask import Flask, Blueprint, current_app, g, render_template, request, Response, flash, redirect, url_for, jsonify, abort, session, make_response, stream_with_context, send_from_directory, send_file
+from markupsafe import Markup
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import FlaskForm
 from forms import *
+from search_index import NgramIndex
+from cache import make_cache, make_version_token
+from datetime_format import DateTimeFormatter
+import sql_profile
+import assets
+import images
+import image_proxy
+import metrics
+from flask.templating import Environment
+from jinja2 import Template
+from catalog_import import read_rows, chunked, split_list, parse_bool, insert_rows, ImportReport
+import catalog_export
+from werkzeug.datastructures import MultiDict
+from werkzeug.local import LocalProxy
+from db_pool import engine_options
+from db_routing import RoutingSQLAlchemy, ReplicaSet, primary_reads
 from flask_migrate import Migrate
 import sys
 import datetime
+import itertools
+import functools
+import hashlib
+import click
+import base64
+import collections
+import time
+import threading
+import os
+import mimetypes
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://jordanhuus@localhost:5432/fyyur'
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+# Extensions and routes are bound to each app built by create_app()
+db = RoutingSQLAlchemy()
+migrate = Migrate()
+moment = Moment()
+main = Blueprint('main', __name__, cli_group=None)
 
 
 #----------------------------------------------------------------------------#
@@ -47,7 +70,17 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, nullable=False)
     seeking_description = db.Column(db.String(120))
-    shows = db.relationship('Show', backref='show_venue', cascade='all,delete', lazy=False)
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    shows = db.relationship('Show', backref='show_venue', cascade='all,delete', lazy='select')
+
+    # Trigram indexes serving the ILIKE search in search_venues, and image_link's
+    # serving the thumbnail proxy's catalog_image() check
+    __table_args__ = (
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_state_trgm', 'state', postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_image_link', 'image_link'),
+    )
 
 
 class Artist(db.Model):
@@ -63,7 +96,15 @@ class Artist(db.Model):
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, nullable=False)
     seeking_description = db.Column(db.String())
-    shows = db.relationship('Show', backref='show_artist', lazy=False)
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    shows = db.relationship('Show', backref='show_artist', lazy='select')
+
+    # Trigram index serving the ILIKE search in search_artists, and image_link's
+    # serving the thumbnail proxy's catalog_image() check
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_image_link', 'image_link'),
+    )
 
 
 class Show(db.Model):
@@ -72,102 +113,784 @@ class Show(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
-    start_time = db.Column(db.String(), nullable=False)
+    start_time = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    # Past/upcoming splits are range scans over one venue's or artist's shows
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+    )
+
+
+class UpcomingSweep(db.Model):
+    """Single row marking where num_upcoming_shows counting starts.
+
+    Venue/Artist.num_upcoming_shows count shows starting at or after
+    swept_until. sweep_upcoming_counts() moves it forward and decrements the
+    counters for the shows it passes.
+    """
+    __tablename__ = 'UpcomingSweep'
+
+    id = db.Column(db.Integer, primary_key=True)
+    swept_until = db.Column(db.DateTime(timezone=True), nullable=False)
+
+#----------------------------------------------------------------------------#
+# Search indexes.
+#----------------------------------------------------------------------------#
+
+# In-process search over the same fields search_catalog() matches in SQL
+search_indexes = LocalProxy(lambda: current_app.extensions['fyyur']['search_indexes'])
+search_fields = {Venue: ('name', 'city', 'state'), Artist: ('name',)}
+
+
+def index_entity(entity):
+    """Add or refresh a Venue or Artist in its search index."""
+    if current_app.config['SEARCH_BACKEND'] == 'memory':
+        model = type(entity)
+        search_indexes[model].add(entity.id, [getattr(entity, field) for field in search_fields[model]])
+
+
+def unindex_entity(model, entity_id):
+    if current_app.config['SEARCH_BACKEND'] == 'memory':
+        search_indexes[model].remove(int(entity_id))
+
+
+def build_search_index(model):
+    """NgramIndex over every row of model."""
+    index = NgramIndex()
+    columns = [getattr(model, field) for field in search_fields[model]]
+    for row in db.session.query(model.id, *columns).order_by(model.id).yield_per(10000):
+        index.add(row[0], row[1:])
+    return index
+
+
+@main.before_app_first_request
+def build_search_indexes():
+    if current_app.config['SEARCH_BACKEND'] != 'memory':
+        return
+
+    for model in search_fields:
+        search_indexes[model] = build_search_index(model)
+    current_app.extensions['fyyur']['search_indexes_built'] = time.monotonic()
+
+
+def refresh_search_indexes():
+    """Rebuild the search indexes in the background once SEARCH_INDEX_REFRESH_SECONDS old.
+
+    index_entity() only reaches this process, so this is how edits made by
+    other workers and commands show up. Searches keep using the old indexes
+    until the new ones replace them, and an edit racing a rebuild may be
+    missing until the next one.
+    """
+    state = current_app.extensions['fyyur']
+    refresh_seconds = current_app.config['SEARCH_INDEX_REFRESH_SECONDS']
+    if not refresh_seconds or time.monotonic() - state['search_indexes_built'] < refresh_seconds:
+        return
+    if not state['search_indexes_refreshing'].acquire(blocking=False):
+        return
+
+    app = current_app._get_current_object()
+    state['search_indexes_built'] = time.monotonic()
+
+    def rebuild():
+        try:
+            with app.app_context():
+                state['search_indexes'].update({model: build_search_index(model) for model in search_fields})
+                db.session.remove()
+        except Exception:
+            app.logger.exception('Search index rebuild failed')
+        finally:
+            state['search_indexes_refreshing'].release()
+
+    threading.Thread(target=rebuild, name='search-index-refresh', daemon=True).start()
+
+#----------------------------------------------------------------------------#
+# View model cache.
+#----------------------------------------------------------------------------#
+
+# Venue and artist detail view models, keyed by ('venue'|'artist', id)
+view_cache = LocalProxy(lambda: current_app.extensions['fyyur']['view_cache'])
+
+
+def cached_view_model(kind, entity_id, build):
+    """build(entity_id) through view_cache, built from the primary; None results are not cached."""
+    key = (kind, entity_id)
+    view_model = view_cache.get(key)
+    if view_model is None:
+        with primary_reads():
+            view_model = build(entity_id)
+        if view_model is not None:
+            view_cache.set(key, view_model, ttl=view_model_ttl(view_model))
+    return view_model
+
+
+def view_model_ttl(view_model):
+    """CACHE_TTL, shortened so the entry expires when its next upcoming show becomes past."""
+    ttl = current_app.config['CACHE_TTL']
+    if view_model['upcoming_shows']:
+        next_start = view_model['upcoming_shows'][0]['start_time']
+        if next_start.tzinfo is None:
+            # Databases without time zones (SQLite) hand back the stored UTC time
+            next_start = next_start.replace(tzinfo=datetime.timezone.utc)
+        ttl = min(ttl, (next_start - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+    return max(ttl, 0)
+
+
+def venue_cache_keys(venue_id):
+    """Keys of every cached page showing this venue: its own and its artists'."""
+    artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+    return [('venue', int(venue_id))] + [('artist', artist_id) for artist_id, in artist_ids]
+
+
+def artist_cache_keys(artist_id):
+    """Keys of every cached page showing this artist: its own and its venues'."""
+    venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    return [('artist', int(artist_id))] + [('venue', venue_id) for venue_id, in venue_ids]
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# Rendered listing pages with their ETags, keyed by data version, and content-keyed fragments
+page_cache = LocalProxy(lambda: current_app.extensions['fyyur']['page_cache'])
+
+
+def data_version():
+    """Token that changes whenever a write handler commits."""
+    return current_app.extensions['fyyur']['data_version'].get()
+
+
+def bump_data_version():
+    return current_app.extensions['fyyur']['data_version'].bump()
+
+
+def cached_page(view):
+    """Serve a GET page from page_cache, answering If-None-Match with 304.
+
+    Pages are cached under the path and data_version() and rendered from the
+    primary, never a replica. The strong ETag is a hash of the cached body,
+    so a 304 only confirms a page this process still holds. ETags are only
+    sent when the version token is shared (CACHE_BACKEND = 'redis'): an
+    in-process token misses writes made by other workers and commands, so
+    those pages are served from the cache for at most CACHE_TTL and never
+    revalidated. Responses carrying flashed messages are rendered fresh and
+    not cached, and streamed responses are passed through without being cached.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if '_flashes' in session:
+            return view(*args, **kwargs)
+
+        key = ('page', request.path, data_version())
+        entry = page_cache.get(key)
+        if entry is None:
+            with primary_reads():
+                html = view(*args, **kwargs)
+            if not isinstance(html, str):
+                return html
+            entry = (hashlib.sha1(html.encode()).hexdigest(), html)
+            page_cache.set(key, entry)
+
+        etag, html = entry
+        if not current_app.extensions['fyyur']['data_version'].shared:
+            response = make_response(html)
+        elif request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+        else:
+            response = make_response(html)
+            response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+
+def cached_fragment(*key_parts, caller):
+    """Jinja call block caching its rendered body under the data it renders.
+
+    {% call cached_fragment('venue-area', area) %}...{% endcall %}
+
+    Meant for a few large blocks per page; small per-row fragments churn the
+    LRU faster than they are reused.
+    """
+    key = ('fragment', hashlib.sha1(repr(key_parts).encode()).hexdigest())
+    html = page_cache.get(key)
+    if html is None:
+        html = caller()
+        page_cache.set(key, html)
+    return Markup(html)
+
+
+main.add_app_template_global(cached_fragment, 'cached_fragment')
+
+#----------------------------------------------------------------------------#
+# Streaming.
+#----------------------------------------------------------------------------#
+
+# Template events joined into each chunk written to the client
+STREAM_BUFFER_EVENTS = 64
+
+
+def stream_page(template_name, **context):
+    """Response rendering template_name while it iterates its row sources.
+
+    Pass queries (with yield_per) rather than lists, so rows are fetched from
+    a server-side cursor as the template reaches them.
+    """
+    current_app.update_template_context(context)
+    stream = current_app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(STREAM_BUFFER_EVENTS)
+    return Response(stream_with_context(stream))
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+def read_only(view):
+    """Mark a non-GET view as safe to serve from a replica."""
+    view.read_only = True
+    return view
+
+
+@main.before_app_request
+def route_reads():
+    """Read from a replica in safe requests, unless this client wrote recently."""
+    replicas = current_app.extensions['fyyur']['replicas']
+    if not replicas or session.get('db_primary_until', 0) > time.time():
+        return
+
+    view = current_app.view_functions.get(request.endpoint)
+    if request.method in ('GET', 'HEAD') or getattr(view, 'read_only', False):
+        g.db_replica = replicas.pick()
+
+
+@main.after_app_request
+def stick_to_primary(response):
+    # Read-your-writes: replicas may not have this request's writes yet
+    if g.get('db_wrote') and current_app.extensions['fyyur']['replicas']:
+        session['db_primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+#----------------------------------------------------------------------------#
+# SQL profiling.
+#----------------------------------------------------------------------------#
+
+@main.after_app_request
+def report_sql(response):
+    """Warn about requests over the SQL_WARN_* budgets and expose their SQL summary.
+
+    Statements a streamed body runs after this point are not counted.
+    """
+    config = current_app.config
+    profile = g.get('sql_profile') or sql_profile.RequestProfile()
+    repeats = config['SQL_WARN_REPEATS']
+    over_budget = (
+        (config['SQL_WARN_STATEMENTS'] and profile.count > config['SQL_WARN_STATEMENTS']) or
+        (config['SQL_WARN_DB_MS'] and profile.seconds * 1000 > config['SQL_WARN_DB_MS']) or
+        (repeats and any(entry[0] >= repeats for entry in profile.statements.values()))
+    )
+    history = current_app.extensions['fyyur']['sql_profiles']
+    if not (over_budget or config['SQL_PROFILE_HEADERS'] or history is not None):
+        return response
+
+    summary = dict(
+        profile.summary(repeats or 2),
+        endpoint=request.endpoint, method=request.method, path=request.full_path.rstrip('?')
+    )
+    if over_budget:
+        current_app.logger.warning('SQL budget exceeded: %s', json.dumps(summary))
+    if config['SQL_PROFILE_HEADERS']:
+        response.headers['X-SQL-Statements'] = str(profile.count)
+        response.headers['X-SQL-Time-Ms'] = f"{profile.seconds * 1000:.1f}"
+        response.headers['X-SQL-Max-Repeats'] = str(max((entry[0] for entry in profile.statements.values()), default=0))
+    if history is not None:
+        history.append(summary)
+    return response
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+metrics_registry = metrics.Registry()
+
+REQUEST_SECONDS = metrics_registry.register(metrics.Histogram(
+    'fyyur_request_duration_seconds', 'Time to handle a request, streamed bodies included.',
+    ('endpoint', 'method')
+))
+REQUESTS_IN_FLIGHT = metrics_registry.register(metrics.Gauge(
+    'fyyur_requests_in_flight', 'Requests being handled.'
+))
+TEMPLATE_SECONDS = metrics_registry.register(metrics.Histogram(
+    'fyyur_template_render_seconds', 'Time to render a template with render_template.', ('template',)
+))
+DB_SECONDS = metrics_registry.register(metrics.Histogram(
+    'fyyur_request_db_seconds', 'Time a request spent executing SQL.', ('endpoint',)
+))
+
+
+class TimedTemplate(Template):
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            TEMPLATE_SECONDS.observe(time.perf_counter() - started, self.name)
+
+
+class TimedEnvironment(Environment):
+    template_class = TimedTemplate
+
+
+def cache_samples(field):
+    def collect():
+        caches = current_app.extensions['fyyur']
+        return {(name,): caches[name + '_cache'].stats.as_dict()[field] for name in ('view', 'page', 'thumbnail')}
+    return collect
+
+
+def pool_samples(field):
+    def collect():
+        pools = [('primary', db.engine.pool)] + [
+            (repr(replica.engine.url), replica.engine.pool)
+            for replica in current_app.extensions['fyyur']['replicas'].replicas
+        ]
+        return {(name,): pool.stats.as_dict(pool)[field] for name, pool in pools if hasattr(pool, 'stats')}
+    return collect
+
+
+for name, field, kind, help in (
+    ('fyyur_cache_hits_total', 'hits', 'counter', 'Cache lookups that found an entry.'),
+    ('fyyur_cache_misses_total', 'misses', 'counter', 'Cache lookups that found nothing.'),
+    ('fyyur_cache_evictions_total', 'evictions', 'counter', 'Entries evicted to stay within the size limit.'),
+    ('fyyur_cache_hit_ratio', 'hit_rate', 'gauge', 'Share of lookups that hit, since the process started.')
+):
+    metrics_registry.register(metrics.Callback(name, help, kind, ('cache',), cache_samples(field)))
+
+for name, field, kind, help in (
+    ('fyyur_db_pool_size', 'size', 'gauge', 'Persistent connections the pool keeps.'),
+    ('fyyur_db_pool_checked_out', 'checked_out', 'gauge', 'Connections in use.'),
+    ('fyyur_db_pool_overflow', 'overflow', 'gauge', 'Connections open beyond the pool size.'),
+    ('fyyur_db_pool_saturation', 'saturation', 'gauge', 'Connections in use over size plus max overflow.'),
+    ('fyyur_db_pool_checkouts_total', 'checkouts', 'counter', 'Connections handed out.'),
+    ('fyyur_db_pool_timeouts_total', 'timeouts', 'counter', 'Checkouts that gave up waiting.'),
+    ('fyyur_db_pool_wait_seconds_total', 'wait_seconds_total', 'counter', 'Time spent waiting for a connection.'),
+    ('fyyur_db_pool_wait_seconds_max', 'wait_seconds_max', 'gauge', 'Longest wait for a connection.')
+):
+    metrics_registry.register(metrics.Callback(name, help, kind, ('pool',), pool_samples(field)))
+
+
+@main.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+
+@main.teardown_app_request
+def record_request_metrics(exception):
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    REQUESTS_IN_FLIGHT.dec()
+
+    # Unrouted paths share one label, so scanners can't blow up the series count
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method)
+    profile = g.get('sql_profile')
+    DB_SECONDS.observe(profile.seconds if profile else 0.0, endpoint)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
+# Compiled Babel patterns and memoized results, see datetime_format.DateTimeFormatter
+datetime_formatter = LocalProxy(lambda: current_app.extensions['fyyur']['datetime_formatter'])
+
+
+def format_datetime(value, format='medium', locale=None):
+    return datetime_formatter.format(value, format, locale)
+
+
+main.add_app_template_filter(format_datetime, 'datetime')
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+def asset_urls(name):
+    """URLs of a bundle or static file: fingerprinted once built with build-assets, the sources before."""
+    manifest = current_app.extensions['fyyur']['assets']
+    return [url_for('static', filename=path) for path in assets.asset_paths(manifest, name)]
+
+
+main.add_app_template_global(asset_urls, 'asset_urls')
+
+
+def responsive_image(name):
+    """src, srcset, width, height and (type, srcset) <source>s of static image name.
+
+    Variants come from build-assets when built, from image_variant on demand
+    otherwise; without Pillow only the original is offered.
+    """
+    image = {"src": url_for('static', filename=name), "srcset": '', "width": None, "height": None, "sources": []}
+    built = current_app.extensions['fyyur']['images'].get(name)
+    if built:
+        image['width'], image['height'] = built['width'], built['height']
+        variants = {
+            format: [(url_for('static', filename=path), width) for path, width in paths]
+            for format, paths in built['sources'].items()
+        }
+    else:
+        path = images.source_path(current_app.static_folder, name)
+        if path is None or not images.available_formats():
+            return image
+        image['width'], image['height'] = images.source_size(path)
+        widths = [width for width in current_app.config['IMAGE_WIDTHS'] if width < image['width']]
+        variants = {
+            format: [(url_for('.image_variant', width=width, format=format, filename=name), width) for width in widths]
+            for format in images.available_formats()
+        }
+
+    for format, urls in variants.items():
+        # Images narrower than every width keep the original
+        if not urls:
+            continue
+        srcset = ', '.join(f"{url} {width}w" for url, width in urls)
+        if format == 'jpeg':
+            image['src'], image['srcset'] = urls[-1][0], srcset
+        else:
+            image['sources'].append((images.MIME_TYPES[format], srcset))
+    return image
+
+
+main.add_app_template_global(responsive_image, 'responsive_image')
+
+#----------------------------------------------------------------------------#
+# Thumbnails.
+#----------------------------------------------------------------------------#
+
+# Remote image_link thumbnails, see image_proxy.ImageProxy
+thumbnail_cache = LocalProxy(lambda: current_app.extensions['fyyur']['thumbnail_cache'])
+
+
+def thumbnail_url(url, size):
+    """URL of image url scaled to THUMBNAIL_SIZES[size] by the proxy, or url itself if it can't be proxied."""
+    if not url or not url.startswith(('http://', 'https://')) or not images.available_formats():
+        return url
+    return url_for('.thumbnail', size=size, url=url)
+
 
-    if format == 'full':
-        format="EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format="EE MM, dd, y h:mma"
+main.add_app_template_global(thumbnail_url, 'thumbnail_url')
 
-    return babel.dates.format_datetime(date, format)
+
+def catalog_image(url):
+    """Whether url is some venue's or artist's image_link; the proxy fetches nothing else."""
+    query = db.session.query(Venue.id).filter(Venue.image_link == url).union_all(
+        db.session.query(Artist.id).filter(Artist.image_link == url)
+    )
+    return query.first() is not None
+
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+# How an endpoint loads Venue.shows / Artist.shows, from least to most work
+LOADING_PROFILES = {
+    'noload': db.noload,          # never touches Show
+    'selectin': db.selectinload,  # one extra IN query for every loaded entity
+    'joined': db.joinedload,      # LEFT OUTER JOIN in the same query
+}
+
+
+# Columns a show listing can select, shared by /shows and /api/v1/shows
+SHOW_LISTING_COLUMNS = {
+    "id": Show.id,
+    "artist_id": Show.artist_id,
+    "artist_name": Artist.name,
+    "artist_image_link": Artist.image_link,
+    "venue_id": Show.venue_id,
+    "venue_name": Venue.name,
+    "venue_image_link": Venue.image_link,
+    "start_time": Show.start_time
+}
+
+
+def show_listing_query(*fields):
+    """Shows joined to their artist and venue, selecting only the named fields."""
+    return db.session.query(
+        *[SHOW_LISTING_COLUMNS[field].label(field) for field in fields]
+    ).join(Artist, Show.artist_id == Artist.id).join(Venue, Show.venue_id == Venue.id)
+
+
+def profiled_query(model, profile, *columns):
+    """model.query loading model.shows per LOADING_PROFILES[profile].
+
+    The 'columns' profile selects only the given columns, for lists and
+    dropdowns that need neither full entities nor their shows.
+    """
+    if profile == 'columns':
+        return db.session.query(*columns)
+    return model.query.options(LOADING_PROFILES[profile](model.shows))
+
+
+def partition_shows(criterion, other_model, *columns):
+    """Past and upcoming shows matching criterion, joined to other_model.
+
+    Counts come from one aggregate query and each list from one range query
+    over the (venue_id|artist_id, start_time) index, so the number of queries
+    is fixed however many shows there are. DETAIL_SHOWS_LIMIT caps each list.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    limit = current_app.config.get('DETAIL_SHOWS_LIMIT')
+
+    past_shows_count, upcoming_shows_count = db.session.query(
+        db.func.count(Show.id).filter(Show.start_time < now),
+        db.func.count(Show.id).filter(Show.start_time >= now)
+    ).filter(criterion).one()
+
+    shows = db.session.query(*columns, Show.start_time).join(other_model).filter(criterion)
+    past_shows = shows.filter(Show.start_time < now).order_by(Show.start_time.desc()).limit(limit)
+    upcoming_shows = shows.filter(Show.start_time >= now).order_by(Show.start_time).limit(limit)
+
+    return {
+        "past_shows": [show._asdict() for show in past_shows],
+        "upcoming_shows": [show._asdict() for show in upcoming_shows],
+        "past_shows_count": past_shows_count,
+        "upcoming_shows_count": upcoming_shows_count
+    }
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+def search_catalog(model, fields, search_term, page=1):
+    """One page of model rows whose fields contain search_term, best match first.
+
+    Matching uses ILIKE, which the trigram GIN indexes on each field serve, and
+    ranks rows by pg_trgm similarity. A row matching several fields appears
+    once, and the total comes from a window count over the matches. Returns
+    (total_matches, rows).
+
+    With SEARCH_BACKEND = 'memory' the page comes from the in-process n-gram
+    index instead, for databases without pg_trgm.
+    """
+    per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+    if current_app.config['SEARCH_BACKEND'] == 'memory':
+        return search_index_page(model, search_term, page, per_page)
+
+    # Backslash is PostgreSQL's default LIKE escape character
+    escaped_term = search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    pattern = f"%{escaped_term}%"
+    rank = db.func.greatest(*[db.func.similarity(field, search_term) for field in fields])
+
+    rows = db.session.query(
+        model.id,
+        model.name,
+        model.num_upcoming_shows,
+        db.func.count().over().label('total')
+    ).filter(
+        db.or_(*[field.ilike(pattern) for field in fields])
+    ).order_by(rank.desc(), model.name, model.id).limit(per_page).offset((page - 1) * per_page).all()
+
+    total = rows[0].total if rows else 0
+    return total, [{
+        "id": row.id,
+        "name": row.name,
+        "num_upcoming_shows": row.num_upcoming_shows
+    } for row in rows]
+
+
+def search_index_page(model, search_term, page, per_page):
+    """search_catalog() page picked from the model's in-process n-gram index."""
+    refresh_search_indexes()
+    total, ids = search_indexes[model].search(search_term, limit=per_page, offset=(page - 1) * per_page)
+    if not ids:
+        return total, []
+
+    rows = db.session.query(model.id, model.name, model.num_upcoming_shows).filter(model.id.in_(ids))
+    rows_by_id = {row.id: row for row in rows}
+
+    return total, [{
+        "id": doc_id,
+        "name": rows_by_id[doc_id].name,
+        "num_upcoming_shows": rows_by_id[doc_id].num_upcoming_shows
+    } for doc_id in ids if doc_id in rows_by_id]
+
+
+def counted_since(lock=False):
+    """swept_until, share-locked for the transaction so a sweep can't pass it meanwhile."""
+    query = db.session.query(UpcomingSweep.swept_until)
+    if lock:
+        query = query.with_for_update(read=True)
+    return query.scalar()
+
+
+def count_upcoming_shows(shows):
+    """Add (venue_id, artist_id, start_time) shows to their counters, in the caller's transaction."""
+    counted_from = counted_since(lock=True)
+    venue_counts = collections.Counter()
+    artist_counts = collections.Counter()
+    for venue_id, artist_id, start_time in shows:
+        if start_time >= counted_from:
+            venue_counts[int(venue_id)] += 1
+            artist_counts[int(artist_id)] += 1
+
+    for model, counts in ((Venue, venue_counts), (Artist, artist_counts)):
+        if counts:
+            db.session.execute(model.__table__.update().where(model.id == db.bindparam('counted_id')).values(
+                num_upcoming_shows=model.num_upcoming_shows + db.bindparam('counted_shows')
+            ), [{"counted_id": entity_id, "counted_shows": shows} for entity_id, shows in counts.items()])
+
+
+def uncount_venue_shows(venue_id):
+    """Decrement artist counters for a venue's counted shows before it is deleted."""
+    counted = db.session.query(
+        Show.artist_id.label('id'),
+        db.func.count(Show.id).label('shows')
+    ).filter(
+        Show.venue_id == venue_id, Show.start_time >= counted_since(lock=True)
+    ).group_by(Show.artist_id).subquery()
+
+    db.session.execute(Artist.__table__.update().where(Artist.id == counted.c.id).values(
+        num_upcoming_shows=Artist.num_upcoming_shows - counted.c.shows
+    ))
+
+
+def sweep_upcoming_counts(until=None):
+    """Stop counting shows that started before until (default now) and commit.
+
+    Run periodically (flask sweep-upcoming-counts from cron); between sweeps
+    the counters still include shows that started since the last one. Bumps
+    the data version when a counter changed. Returns the new swept_until.
+    """
+    until = until or datetime.datetime.now(datetime.timezone.utc)
+    sweep = UpcomingSweep.query.with_for_update().one()
+    if until <= sweep.swept_until:
+        db.session.rollback()
+        return sweep.swept_until
+
+    changed = 0
+    for model, column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        passed = db.session.query(
+            column.label('id'),
+            db.func.count(Show.id).label('shows')
+        ).filter(
+            Show.start_time >= sweep.swept_until, Show.start_time < until
+        ).group_by(column).subquery()
+
+        changed += db.session.execute(model.__table__.update().where(model.id == passed.c.id).values(
+            num_upcoming_shows=model.num_upcoming_shows - passed.c.shows
+        )).rowcount
+
+    sweep.swept_until = until
+    db.session.commit()
+    if changed:
+        bump_data_version()
+    return until
+
+
+def rebuild_upcoming_counts(until=None):
+    """Recount every venue and artist from Show, commit and bump the data version; for repairs and setup."""
+    until = until or datetime.datetime.now(datetime.timezone.utc)
+    sweep = UpcomingSweep.query.with_for_update().one()
+
+    for model, column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        upcoming = db.session.query(db.func.count(Show.id)).filter(
+            column == model.id, Show.start_time >= until
+        ).correlate(model.__table__).as_scalar()
+        db.session.execute(model.__table__.update().values(num_upcoming_shows=upcoming))
+
+    sweep.swept_until = until
+    db.session.commit()
+    bump_data_version()
+    return until
+
+
+# Tables the export command and endpoint can dump
+EXPORT_MODELS = {"venues": Venue, "artists": Artist, "shows": Show}
+
+
+def export_batches(model, batch_size, since_id=0, since=None):
+    """Column names and batches of row tuples of model's table, in id order.
+
+    Rows come from a server-side cursor, so memory stays at one batch. Only
+    rows after since_id are included, and for shows only those starting at or
+    after since, which is how incremental exports resume.
+    """
+    columns = list(model.__table__.columns)
+    query = db.session.query(*columns).filter(model.id > since_id)
+    if since is not None:
+        query = query.filter(Show.start_time >= since)
+    rows = query.order_by(model.id).yield_per(batch_size)
+    return [column.name for column in columns], chunked(rows, batch_size)
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@main.route('/')
 def index():
     return render_template('pages/home.html')
 
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@main.route('/venues')
+@cached_page
 def venues():
-    venue_data = []
-    unique_location_locations = Venue.query.distinct(Venue.city, Venue.state).all()
-    for unique_location in unique_location_locations:
-
-        # Venue location
-        venue_location = {
-            "city": unique_location.city,
-            "state": unique_location.state,
-            "venues": []
-        }
+    # Every venue with its upcoming show count, ordered so areas are contiguous
+    venue_rows = db.session.query(
+        Venue.city,
+        Venue.state,
+        Venue.id,
+        Venue.name,
+        Venue.num_upcoming_shows
+    ).order_by(Venue.city, Venue.state, Venue.id)
 
-        # Venues within that location
-        for venue in Venue.query.filter(Venue.city==unique_location.city, Venue.state==unique_location.state):
-            venue_location["venues"].append({
+    venue_data = []
+    for (city, state), area_venues in itertools.groupby(venue_rows, key=lambda venue: (venue.city, venue.state)):
+        venue_data.append({
+            "city": city,
+            "state": state,
+            "venues": [{
                 "id": venue.id,
                 "name": venue.name,
-                "num_upcoming_shows": Show.query.filter(Show.venue_id==venue.id, db.cast(Show.start_time, db.Date) >= datetime.datetime.now()).count()
-            })
-
-        venue_data.append(venue_location)
+                "num_upcoming_shows": venue.num_upcoming_shows
+            } for venue in area_venues]
+        })
 
     return render_template('pages/venues.html', areas=venue_data);
 
 
-@app.route('/venues/search', methods=['POST'])
+@main.route('/venues/search', methods=['POST'])
+@read_only
 def search_venues():
     # Search term
     venue_search_term = request.form.get('search_term', '')
 
-    # Search by name (case insensitive)
-    venues_by_name = Venue.query.filter(Venue.name.ilike(f"%{venue_search_term}%")).all()
+    page = max(request.form.get('page', 1, type=int), 1)
 
-    # Search by city (case insensitive)
-    venues_by_city = Venue.query.filter(Venue.city.ilike(f"%{venue_search_term}%")).all()
-
-    # Search by state (case insensitive)
-    venues_by_state = Venue.query.filter(Venue.state.ilike(f"%{venue_search_term}%")).all()
+    # Search name, city and state in one ranked query
+    count, data = search_catalog(Venue, (Venue.name, Venue.city, Venue.state), venue_search_term, page)
 
     # Response data
     response = {
-        "count": len(venues_by_name) + len(venues_by_city) + len(venues_by_state),
-        "data" : []
+        "count": count,
+        "data": data,
+        "next_page": page + 1 if page * current_app.config['SEARCH_RESULTS_PER_PAGE'] < count else None
     }
-    for venue in (venues_by_name + venues_by_city + venues_by_state):
-        response["data"].append({
-            "id": venue.id,
-            "name": venue.name,
-            "num_upcoming_shows": Show.query.filter(Show.venue_id == venue.id, db.cast(Show.start_time, db.Date) >= datetime.datetime.now()).count()
-        })
-
 
     if response['count'] == 0:
         flash(f"No results found for {venue_search_term}.")
-        return redirect(url_for('venues'))
+        return redirect(url_for('.venues'))
     else:
         return render_template('pages/search_venues.html', results=response, search_term=venue_search_term)
 
 
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    # Gather artist data
-    venue = Venue.query.get(venue_id)
+def venue_view_model(venue_id):
+    """Template data for pages/show_venue.html, or None for an unknown venue."""
+    # Gather venue data
+    venue = profiled_query(Venue, 'noload').get(venue_id)
     if venue == None:
-        abort(404)
+        return None
     venue_data = {
         "id": venue.id,
         "name": venue.name,
@@ -184,50 +907,35 @@ def show_venue(venue_id):
     }
 
     # Append show data
-    past_shows = []
-    upcoming_shows = []
-    for show in Show.query.filter_by(venue_id=venue_id):
-
-        print()
-        print()
-        print(show.id)
-        print(show.start_time)
-        print()
-        print()
-
-        # Past vs upcoming shows
-        if datetime.datetime.strptime(show.start_time, '%Y-%m-%dT%H:%M:%S.%fZ') < datetime.datetime.now():
-            past_shows.append({
-                "artist_id": show.artist_id,
-                "artist_name": Artist.query.get(show.artist_id).name,
-                "artist_image_link": Artist.query.get(show.artist_id).image_link,
-                "start_time": show.start_time
-            })
-        else:
-            upcoming_shows.append({
-                "artist_id": show.artist_id,
-                "artist_name": Artist.query.get(show.artist_id).name,
-                "artist_image_link": Artist.query.get(show.artist_id).image_link,
-                "start_time": show.start_time
-            })
+    venue_data.update(partition_shows(
+        Show.venue_id == venue_id,
+        Artist,
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+    ))
+
+    return venue_data
 
-    venue_data["past_shows"] = past_shows
-    venue_data["upcoming_shows"] = upcoming_shows
-    venue_data["past_shows_count"] = len(past_shows)
-    venue_data["upcoming_shows_count"] = len(upcoming_shows)
+
+@main.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+    venue_data = cached_view_model('venue', venue_id, venue_view_model)
+    if venue_data == None:
+        abort(404)
 
     return render_template('pages/show_venue.html', venue=venue_data)
 
 
 #  Create Venue
 #  ----------------------------------------------------------------
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     name = request.form.get('name')
     city = request.form.get('city')
@@ -256,6 +964,8 @@ def create_venue_submission():
     try:
         db.session.add(new_venue)
         db.session.commit()
+        index_entity(new_venue)
+        bump_data_version()
         flash(f'Venue {request.form["name"]} was successfully listed!')
     except:
         error = True
@@ -271,16 +981,22 @@ def create_venue_submission():
         return render_template('pages/home.html')
 
 
-@app.route('/venues/delete/<venue_id>', methods=['POST'])
+@main.route('/venues/delete/<venue_id>', methods=['POST'])
 def delete_venue(venue_id):
     error = False
     venue = None
     venue_name = ""
     try:
-        venue = Venue.query.get(venue_id)
+        # Shows are deleted by cascade, so load them up front in one query
+        venue = profiled_query(Venue, 'selectin').get(venue_id)
         venue_name = venue.name
+        stale_keys = venue_cache_keys(venue_id)
+        uncount_venue_shows(venue_id)
         db.session.delete(venue)
         db.session.commit()
+        unindex_entity(Venue, venue_id)
+        view_cache.delete(*stale_keys)
+        bump_data_version()
         flash(f'Venue {venue_name} was successfully removed.')
         print(f'Venue {venue_name} was successfully removed.')
     except:
@@ -294,16 +1010,20 @@ def delete_venue(venue_id):
     if error:
         abort(500)
     else:
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@main.route('/artists')
+@cached_page
 def artists():
+    artist_rows = profiled_query(Artist, 'columns', Artist.id, Artist.name)
+    if current_app.config['STREAM_LISTING_PAGES']:
+        return stream_page('pages/artists.html', artists=artist_rows.yield_per(current_app.config['STREAM_YIELD_PER']))
 
     data = []
-    for artist in Artist.query.all():
+    for artist in artist_rows:
         data.append({
             "id": artist.id,
             "name": artist.name
@@ -312,33 +1032,32 @@ def artists():
     return render_template('pages/artists.html', artists=data)
 
 
-@app.route('/artists/search', methods=['POST'])
+@main.route('/artists/search', methods=['POST'])
+@read_only
 def search_artists():
     # Form artist search term
     artist_search_term = request.form.get('search_term', '')
 
-    # Query artist objects that contain (case insensitive) the specified search term
-    artists = Artist.query.filter(Artist.name.ilike(f"%{artist_search_term}%")).all()
+    page = max(request.form.get('page', 1, type=int), 1)
+
+    # Query artists whose name contains (case insensitive) the specified search term
+    count, data = search_catalog(Artist, (Artist.name,), artist_search_term, page)
 
     # Response data
     response = {
-        "count": len(artists),
-        "data" : []
+        "count": count,
+        "data": data,
+        "next_page": page + 1 if page * current_app.config['SEARCH_RESULTS_PER_PAGE'] < count else None
     }
-    for artist in artists:
-        response["data"].append({
-            "id": artist.id,
-            "name": artist.name,
-            "num_upcoming_shows": Show.query.filter(Show.artist_id == artist.id, db.cast(Show.start_time, db.Date) >= datetime.datetime.now()).count()
-        })
 
     return render_template('pages/search_artists.html', results=response, search_term=artist_search_term)
 
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-
+def artist_view_model(artist_id):
+    """Template data for pages/show_artist.html, or None for an unknown artist."""
     # Gather artist data
-    artist = Artist.query.get(artist_id)
+    artist = profiled_query(Artist, 'noload').get(artist_id)
+    if artist == None:
+        return None
     artist_data = {
         "id": artist.id,
         "name": artist.name,
@@ -354,39 +1073,32 @@ def show_artist(artist_id):
     }
 
     # Append show data
-    past_shows = []
-    upcoming_shows = []
-    for show in Show.query.filter_by(artist_id=artist.id):
-        # Past vs upcoming shows
-        if datetime.datetime.strptime(show.start_time, '%Y-%m-%dT%H:%M:%S.%fZ') < datetime.datetime.now():
-            past_shows.append({
-                "venue_id": show.venue_id,
-                "venue_name": Venue.query.get(show.venue_id).name,
-                "venue_image_link": Venue.query.get(show.venue_id).image_link,
-                "start_time": show.start_time
-            })
-        else:
-            upcoming_shows.append({
-                "venue_id": show.venue_id,
-                "venue_name": Venue.query.get(show.venue_id).name,
-                "venue_image_link": Venue.query.get(show.venue_id).image_link,
-                "start_time": show.start_time
-            })
+    artist_data.update(partition_shows(
+        Show.artist_id == artist_id,
+        Venue,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link')
+    ))
+
+    return artist_data
 
-    artist_data["past_shows"] = past_shows
-    artist_data["upcoming_shows"] = upcoming_shows
-    artist_data["past_shows_count"] = len(past_shows)
-    artist_data["upcoming_shows_count"] = len(upcoming_shows)
+
+@main.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+    artist_data = cached_view_model('artist', artist_id, artist_view_model)
+    if artist_data == None:
+        abort(404)
 
     return render_template('pages/show_artist.html', artist=artist_data)
 
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     form = ArtistForm()
-    artist = Artist.query.get(artist_id)
+    artist = profiled_query(Artist, 'noload').get(artist_id)
     if artist == None:
         abort(404)
     else:
@@ -394,7 +1106,7 @@ def edit_artist(artist_id):
 
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     # Form data
     name = request.form.get('name')
@@ -407,7 +1119,7 @@ def edit_artist_submission(artist_id):
     error = False
     try:
         # Update artist
-        artist = Artist.query.get(artist_id)
+        artist = profiled_query(Artist, 'noload').get(artist_id)
         artist.name = name
         artist.city = city
         artist.state = state
@@ -416,6 +1128,9 @@ def edit_artist_submission(artist_id):
         artist.facebook_link = facebook_link
 
         db.session.commit()
+        index_entity(artist)
+        view_cache.delete(*artist_cache_keys(artist_id))
+        bump_data_version()
     except:
         error = True
         db.session.rollback()
@@ -425,17 +1140,17 @@ def edit_artist_submission(artist_id):
     if error:
         abort(500)
     else:
-        return redirect(url_for('show_artist', artist_id=artist_id))
+        return redirect(url_for('.show_artist', artist_id=artist_id))
 
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     form = VenueForm()
-    venue = Venue.query.get(venue_id)
+    venue = profiled_query(Venue, 'noload').get(venue_id)
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     # Form data
     name = request.form.get('name')
@@ -449,7 +1164,7 @@ def edit_venue_submission(venue_id):
     error = False
     try:
         # Update venue
-        venue = Venue.query.get(venue_id)
+        venue = profiled_query(Venue, 'noload').get(venue_id)
         venue.name = name
         venue.city = city
         venue.state = state
@@ -459,6 +1174,9 @@ def edit_venue_submission(venue_id):
         venue.facebook_link = facebook_link
 
         db.session.commit()
+        index_entity(venue)
+        view_cache.delete(*venue_cache_keys(venue_id))
+        bump_data_version()
     except:
         error = True
         db.session.rollback()
@@ -468,18 +1186,18 @@ def edit_venue_submission(venue_id):
     if error:
         abort(500)
     else:
-        return redirect(url_for('show_venue', venue_id=venue_id))
+        return redirect(url_for('.show_venue', venue_id=venue_id))
 
 
 #  Create Artist
 #  ----------------------------------------------------------------
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     # Form data
     name = request.form.get('name')
@@ -508,6 +1226,8 @@ def create_artist_submission():
     try:
         db.session.add(new_artist)
         db.session.commit()
+        index_entity(new_artist)
+        bump_data_version()
         flash(f'Artist {request.form["name"]} was successfully listed!')
     except:
         error = True
@@ -525,48 +1245,51 @@ def create_artist_submission():
 
 #  Shows
 #  ----------------------------------------------------------------
-@app.route('/shows')
+@main.route('/shows')
+@cached_page
 def shows():
-    shows = []
-    for show in Show.query.all():
-        shows.append({
-            'artist_id': show.artist_id,
-            'artist_name': Artist.query.get(show.artist_id).name,
-            'artist_image_link': Artist.query.get(show.artist_id).image_link,
-            'venue_id': show.venue_id,
-            'venue_name': Venue.query.get(show.venue_id).name,
-            'start_time': show.start_time
-        })
+    # One joined query, only the columns pages/shows.html renders
+    show_rows = show_listing_query('artist_id', 'artist_name', 'artist_image_link', 'venue_id', 'venue_name', 'start_time')
+    if current_app.config['STREAM_LISTING_PAGES']:
+        return stream_page('pages/shows.html', shows=show_rows.yield_per(current_app.config['STREAM_YIELD_PER']))
+
+    shows = [show._asdict() for show in show_rows]
+    start_times = datetime_formatter.format_many([show['start_time'] for show in shows], 'full')
+    for show, start_time_text in zip(shows, start_times):
+        show['start_time_text'] = start_time_text
 
     return render_template('pages/shows.html', shows=shows)
 
 
-@app.route('/shows/create')
+@main.route('/shows/create')
 def create_shows():
     form = ShowForm()
 
     # Artist data
-    artists = Artist.query.all()
+    artists = profiled_query(Artist, 'columns', Artist.id, Artist.name)
 
     # Venue data
-    venues = Venue.query.all()
+    venues = profiled_query(Venue, 'columns', Venue.id, Venue.name)
 
     return render_template('forms/new_show.html', form=form, artists=artists, venues=venues)
 
 
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
 def create_show_submission():
     # Retrieve form data
     artist_id = request.form.get('artist_id')
     venue_id = request.form.get('venue_id')
-    start_time = request.form.get('start_time')+':00.00Z'
+    start_time = dateutil.parser.parse(request.form.get('start_time')+':00.00Z')
 
     # Add data to database
     new_show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
     error = False
     try:
         db.session.add(new_show)
+        count_upcoming_shows([(venue_id, artist_id, start_time)])
         db.session.commit()
+        view_cache.delete(('venue', int(venue_id)), ('artist', int(artist_id)))
+        bump_data_version()
         flash('Show was successfully listed!')
     except:
         db.session.rollback()
@@ -582,25 +1305,582 @@ def create_show_submission():
         return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+#  API
+#  ----------------------------------------------------------------
+
+# Fields each list endpoint can return, by resource
+API_LIST_FIELDS = {
+    "venues": (Venue.id, {
+        column.name: column for column in (
+            Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone,
+            Venue.image_link, Venue.genres, Venue.website, Venue.facebook_link,
+            Venue.seeking_talent, Venue.seeking_description, Venue.num_upcoming_shows
+        )
+    }),
+    "artists": (Artist.id, {
+        column.name: column for column in (
+            Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone, Artist.genres,
+            Artist.image_link, Artist.facebook_link, Artist.seeking_venue,
+            Artist.seeking_description, Artist.num_upcoming_shows
+        )
+    }),
+    "shows": (Show.id, SHOW_LISTING_COLUMNS)
+}
+
+
+def api_json(value):
+    """Compact JSON, with datetimes as ISO 8601."""
+    return json.dumps(value, separators=(',', ':'), default=lambda obj: obj.isoformat())
+
+
+def api_error(message, status=400):
+    return Response(api_json({"error": message}), status=status, mimetype='application/json')
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+
+def requested_fields(available):
+    """Fields named by ?fields=a,b (all of available by default); ValueError on unknown names."""
+    if 'fields' not in request.args:
+        return list(available)
+
+    fields = [field for field in request.args['fields'].split(',') if field]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+@main.route('/api/v1/<any(venues, artists, shows):resource>')
+def api_list(resource):
+    """One keyset page of a resource, streamed as {"data": [...], "next_cursor": ...}.
+
+    ?cursor= continues after the last id of the previous page, ?limit= sets
+    the page size (API_MAX_PAGE_SIZE at most) and ?fields= picks columns.
+    """
+    id_column, available = API_LIST_FIELDS[resource]
+    try:
+        fields = requested_fields(available)
+        after = decode_cursor(request.args['cursor']) if 'cursor' in request.args else 0
+        limit = min(int(request.args.get('limit', current_app.config['API_DEFAULT_PAGE_SIZE'])), current_app.config['API_MAX_PAGE_SIZE'])
+    except ValueError as error:
+        return api_error(str(error))
+    if limit < 1:
+        return api_error("limit must be positive")
+
+    if resource == 'shows':
+        query = show_listing_query('id', *fields)
+    else:
+        query = db.session.query(id_column, *[available[field].label(field) for field in fields])
+    rows = query.filter(id_column > after).order_by(id_column).limit(limit + 1).execution_options(stream_results=True)
+
+    def generate():
+        yield '{"data":['
+        last_id = None
+        for position, row in enumerate(rows):
+            if position == limit:
+                yield f'],"next_cursor":{api_json(encode_cursor(last_id))}}}'
+                return
+            if position:
+                yield ','
+            last_id = row[0]
+            yield api_json(dict(zip(fields, row[1:])))
+        yield '],"next_cursor":null}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+@main.route('/api/v1/export/<any(venues, artists, shows):kind>')
+def api_export(kind):
+    """Stream a whole table as NDJSON or CSV; ?since_id= and, for shows, ?since= resume."""
+    file_format = request.args.get('format', 'ndjson')
+    if file_format not in ('ndjson', 'csv'):
+        return api_error("format must be ndjson or csv")
+    try:
+        since_id = int(request.args.get('since_id', 0))
+        since = dateutil.parser.isoparse(request.args['since']) if 'since' in request.args else None
+    except ValueError as error:
+        return api_error(str(error))
+    if since is not None and kind != 'shows':
+        return api_error("since only applies to shows")
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+
+    columns, batches = export_batches(EXPORT_MODELS[kind], current_app.config['EXPORT_BATCH_SIZE'], since_id, since)
+    response = Response(
+        stream_with_context(catalog_export.text_chunks(file_format, columns, batches)),
+        mimetype='application/x-ndjson' if file_format == 'ndjson' else 'text/csv'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}.{file_format}'
+    return response
+
+
+@main.route('/api/v1/venues/<int:venue_id>')
+def api_venue(venue_id):
+    return api_detail(cached_view_model('venue', venue_id, venue_view_model))
+
+
+@main.route('/api/v1/artists/<int:artist_id>')
+def api_artist(artist_id):
+    return api_detail(cached_view_model('artist', artist_id, artist_view_model))
+
+
+def api_detail(view_model):
+    """The cached detail view model as JSON, trimmed to ?fields= if given."""
+    if view_model is None:
+        return api_error("Not found", 404)
+    try:
+        fields = requested_fields(view_model)
+    except ValueError as error:
+        return api_error(str(error))
+    return Response(api_json({field: view_model[field] for field in fields}), mimetype='application/json')
+
+
+@main.route('/cache/stats')
+def cache_stats():
+    return jsonify(view_cache.stats.as_dict())
+
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+@main.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@main.route('/debug/sql')
+def recent_sql():
+    """SQL summaries of the latest requests, if SQL_PROFILE_ENDPOINT is on."""
+    history = current_app.extensions['fyyur']['sql_profiles']
+    if history is None:
+        abort(404)
+    return jsonify(list(history))
+
+
+@main.route('/pool/stats')
+def pool_stats():
+    pool = db.engine.pool
+    stats = pool.stats.as_dict(pool) if hasattr(pool, 'stats') else {}
+    replicas = current_app.extensions['fyyur']['replicas']
+    if replicas:
+        stats['replicas'] = replicas.as_dicts()
+    return jsonify(stats)
+
+
+@main.route('/static/dist/<path:filename>')
+def built_asset(filename):
+    """Build output, precompressed when the client accepts it; names change with content, so cached for good."""
+    dist = os.path.join(current_app.static_folder, assets.DIST_DIR)
+    sent, encoding = assets.precompressed(dist, filename, request.headers.get('Accept-Encoding', ''))
+    response = send_from_directory(dist, sent, mimetype=mimetypes.guess_type(filename)[0])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config['ASSET_MAX_AGE']}, immutable"
+    return response
+
+
+@main.route('/images/<int:width>/<format>/<path:filename>')
+def image_variant(width, format, filename):
+    """Static image filename resized to one of IMAGE_WIDTHS, transformed once and kept in IMAGE_CACHE_DIR."""
+    path = images.source_path(current_app.static_folder, filename)
+    if path is None or format not in images.available_formats() or width not in current_app.config['IMAGE_WIDTHS']:
+        abort(404)
+    variant = images.cached_variant(path, current_app.config['IMAGE_CACHE_DIR'], width, format)
+    response = send_file(variant, mimetype=images.MIME_TYPES[format], conditional=True)
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config['IMAGE_MAX_AGE']}"
+    return response
+
+
+@main.route('/thumbnails/<size>')
+def thumbnail(size):
+    """The image_link in ?url= scaled to THUMBNAIL_SIZES[size], as WebP if the client accepts it.
+
+    Remote failures redirect to the original for a minute, so pages degrade
+    to hot-linking rather than broken images.
+    """
+    url = request.args.get('url', '')
+    box = current_app.config['THUMBNAIL_SIZES'].get(size)
+    formats = images.available_formats()
+    if box is None or not url or 'jpeg' not in formats:
+        abort(404)
+    accepts_webp = 'webp' in formats and 'image/webp' in request.accept_mimetypes.values()
+    format = 'webp' if accepts_webp else 'jpeg'
+
+    try:
+        path = thumbnail_cache.thumbnail(url, box, format, catalog_image)
+    except image_proxy.ImageNotAllowed:
+        abort(404)
+    except image_proxy.FetchError as error:
+        current_app.logger.info('Thumbnail of %s failed: %s', url, error)
+        response = redirect(url)
+        response.headers['Cache-Control'] = 'public, max-age=60'
+        return response
+
+    response = send_file(path, mimetype=images.MIME_TYPES[format], conditional=True)
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config['THUMBNAIL_MAX_AGE']}"
+    response.vary.add('Accept')
+    return response
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+def warn_unshared_version():
+    """Warn that running servers won't see this command's bump_data_version().
+
+    An in-process version token and cache only live in the command's
+    process, so servers keep their cached pages until CACHE_TTL runs out.
+    """
+    if not current_app.extensions['fyyur']['data_version'].shared:
+        click.echo(
+            f"Warning: CACHE_BACKEND is {current_app.config['CACHE_BACKEND']!r}, not 'redis', so running servers "
+            f"may serve cached pages without this change for up to {current_app.config['CACHE_TTL']} seconds",
+            err=True
+        )
+
+
+@main.cli.command('build-assets')
+def build_assets_command():
+    """Bundle, minify, fingerprint and precompress static assets, and resize images, into static/dist."""
+    manifest = assets.build(current_app.static_folder)
+    current_app.extensions['fyyur']['assets'] = manifest
+    for name, path in sorted(manifest.items()):
+        size = os.path.getsize(os.path.join(current_app.static_folder, path))
+        click.echo(f"{name} -> {path} ({size:,} bytes)")
+
+    image_manifest = images.build(current_app.static_folder)
+    current_app.extensions['fyyur']['images'] = image_manifest
+    if not image_manifest:
+        click.echo("Images not resized: Pillow is not installed", err=True)
+    for name, image in sorted(image_manifest.items()):
+        for format, variants in image['sources'].items():
+            sizes = ', '.join(
+                f"{width}w {os.path.getsize(os.path.join(current_app.static_folder, path)) // 1024:,}KB"
+                for path, width in variants
+            )
+            click.echo(f"{name} -> {format}: {sizes}")
+
+
+@main.cli.command('sweep-upcoming-counts')
+@click.option('--rebuild', is_flag=True, help='Recount every venue and artist from scratch.')
+def sweep_upcoming_counts_command(rebuild):
+    """Roll shows that have started out of the upcoming show counters.
+
+    Nothing runs this for you: schedule it, e.g. every minute from cron, or
+    /venues and /artists keep counting shows that have already started.
+    """
+    if rebuild:
+        swept_until = rebuild_upcoming_counts()
+    else:
+        swept_until = sweep_upcoming_counts()
+    warn_unshared_version()
+    click.echo(f'Upcoming show counts are current as of {swept_until.isoformat()}')
+
+
+def import_formdata(row, list_fields):
+    """MultiDict for validating an imported row with a WTForms form."""
+    formdata = MultiDict()
+    for field, value in row.items():
+        if field in list_fields:
+            for item in split_list(value):
+                formdata.add(field, item)
+        elif value is not None:
+            formdata.add(field, str(value))
+    return formdata
+
+
+def venue_import_records(chunk, report):
+    """Venue rows for insert_rows(), validated like VenueForm; bad rows go to report."""
+    records = []
+    for line_number, row in chunk:
+        form = VenueForm(formdata=import_formdata(row, ('genres',)), meta={'csrf': False})
+        if not form.validate():
+            report.reject(line_number, form.errors)
+        elif not form.image_link.data:
+            report.reject(line_number, {"image_link": ["This field is required."]})
+        else:
+            records.append({
+                "name": form.name.data,
+                "city": form.city.data,
+                "state": form.state.data,
+                "address": form.address.data,
+                "phone": form.phone.data,
+                "image_link": form.image_link.data,
+                "genres": form.genres.data,
+                "website": form.website.data,
+                "facebook_link": form.facebook_link.data,
+                # Same defaults as create_venue_submission
+                "seeking_talent": parse_bool(row.get('seeking_talent', True)),
+                "seeking_description": row.get('seeking_description') or 'Seeking awesome talent.'
+            })
+    return records
+
+
+def artist_import_records(chunk, report):
+    """Artist rows for insert_rows(), validated like ArtistForm; bad rows go to report."""
+    records = []
+    for line_number, row in chunk:
+        form = ArtistForm(formdata=import_formdata(row, ('genres',)), meta={'csrf': False})
+        if not form.validate():
+            report.reject(line_number, form.errors)
+        elif not form.image_link.data:
+            report.reject(line_number, {"image_link": ["This field is required."]})
+        else:
+            records.append({
+                "name": form.name.data,
+                "city": form.city.data,
+                "state": form.state.data,
+                "phone": form.phone.data,
+                "genres": form.genres.data,
+                "image_link": form.image_link.data,
+                "facebook_link": form.facebook_link.data,
+                "seeking_venue": parse_bool(row.get('seeking_venue')),
+                "seeking_description": row.get('seeking_description')
+            })
+    return records
+
+
+def resolve_references(model, chunk, id_field, name_field):
+    """{line_number: id or error} for the chunk's references to model, in two queries.
+
+    Rows give either an id, which must exist, or a name, which must be unique.
+    """
+    ids = {int(row[id_field]) for _, row in chunk if str(row.get(id_field) or '').isdigit()}
+    names = {row[name_field] for _, row in chunk if not row.get(id_field) and row.get(name_field)}
+    existing_ids = {entity_id for entity_id, in db.session.query(model.id).filter(model.id.in_(ids))} if ids else set()
+    ids_by_name = {}
+    if names:
+        for name, entity_id, matches in db.session.query(
+            model.name, db.func.min(model.id), db.func.count(model.id)
+        ).filter(model.name.in_(names)).group_by(model.name):
+            ids_by_name[name] = entity_id if matches == 1 else f"{name!r} matches {matches} rows"
+
+    resolved = {}
+    for line_number, row in chunk:
+        if row.get(id_field):
+            entity_id = str(row[id_field])
+            found = entity_id.isdigit() and int(entity_id) in existing_ids
+            resolved[line_number] = int(entity_id) if found else f"No {model.__tablename__} with id {entity_id}"
+        elif row.get(name_field):
+            resolved[line_number] = ids_by_name.get(row[name_field], f"No {model.__tablename__} named {row[name_field]!r}")
+        else:
+            resolved[line_number] = f"{id_field} or {name_field} is required"
+    return resolved
+
+
+def show_import_records(chunk, report):
+    """Show rows for insert_rows() with venue/artist references resolved per chunk."""
+    venue_ids = resolve_references(Venue, chunk, 'venue_id', 'venue_name')
+    artist_ids = resolve_references(Artist, chunk, 'artist_id', 'artist_name')
+
+    records = []
+    for line_number, row in chunk:
+        errors = {}
+        for field, resolved in (("venue_id", venue_ids[line_number]), ("artist_id", artist_ids[line_number])):
+            if isinstance(resolved, str):
+                errors[field] = [resolved]
+        try:
+            start_time = dateutil.parser.parse(str(row.get('start_time') or ''))
+            if start_time.tzinfo is None:
+                start_time = start_time.replace(tzinfo=datetime.timezone.utc)
+        except (ValueError, OverflowError):
+            errors["start_time"] = ["Not a valid datetime value"]
+
+        if errors:
+            report.reject(line_number, errors)
+        else:
+            records.append({
+                "venue_id": venue_ids[line_number],
+                "artist_id": artist_ids[line_number],
+                "start_time": start_time
+            })
+    return records
+
+
+IMPORTERS = {
+    "venues": (Venue, venue_import_records),
+    "artists": (Artist, artist_import_records),
+    "shows": (Show, show_import_records)
+}
+
+
+@main.cli.command('import-catalog')
+@click.argument('kind', type=click.Choice(sorted(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows validated and inserted per statement.')
+@click.option('--rejects', type=click.Path(dir_okay=False), help='Write rejected rows and their errors here as NDJSON.')
+def import_catalog_command(kind, path, file_format, chunk_size, rejects):
+    """Bulk load venues, artists or shows from a CSV or NDJSON file.
+
+    CSV list fields such as genres are separated by semicolons. Shows give
+    venue_id or venue_name, artist_id or artist_name, and start_time.
+    """
+    model, build_records = IMPORTERS[kind]
+    report = ImportReport()
+
+    for chunk in chunked(read_rows(path, file_format, report), chunk_size):
+        rejected_before = len(report.rejected)
+        records = build_records(chunk, report)
+        try:
+            insert_rows(db.session, model.__table__, records)
+            if model is Show:
+                count_upcoming_shows([(show["venue_id"], show["artist_id"], show["start_time"]) for show in records])
+            db.session.commit()
+        except Exception as error:
+            # The whole chunk is rolled back, so its valid rows are rejected too
+            db.session.rollback()
+            invalid_lines = {rejected["line"] for rejected in report.rejected[rejected_before:]}
+            for line_number, _ in chunk:
+                if line_number not in invalid_lines:
+                    report.reject(line_number, {"database": [str(error).splitlines()[0]]})
+            continue
+
+        report.accepted += len(records)
+        if model is Show:
+            view_cache.delete(*{key for show in records for key in (('venue', show["venue_id"]), ('artist', show["artist_id"]))})
+        # Progress on stderr, final summary on stdout
+        click.echo(report.summary(), err=True)
+
+    bump_data_version()
+    warn_unshared_version()
+    if rejects:
+        report.write_rejects(rejects)
+    for rejected in report.rejected[:10]:
+        click.echo(f"line {rejected['line']}: {rejected['errors']}", err=True)
+    click.echo(report.summary())
+
+
+@main.cli.command('export-catalog')
+@click.argument('kind', type=click.Choice(sorted(EXPORT_MODELS)))
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True), default='-')
+@click.option('--format', 'file_format', type=click.Choice(catalog_export.FORMATS), default='ndjson', show_default=True)
+@click.option('--batch-size', default=None, type=int, help='Rows fetched and written at a time (EXPORT_BATCH_SIZE).')
+@click.option('--since-id', default=0, show_default=True, help='Only rows with a greater id.')
+@click.option('--since', type=click.DateTime(), help='Shows only: those starting at or after this UTC time.')
+def export_catalog_command(kind, path, file_format, batch_size, since_id, since):
+    """Dump venues, artists or shows to PATH (stdout by default) as NDJSON, CSV or Parquet.
+
+    Prints the last exported id, to pass as --since-id on the next run.
+    """
+    if since is not None and kind != 'shows':
+        raise click.BadParameter("only applies to shows", param_hint='--since')
+    if since is not None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+    if file_format == 'parquet' and path == '-':
+        raise click.BadParameter("parquet needs a file path", param_hint='PATH')
+
+    started = time.perf_counter()
+    exported = 0
+    last_id = since_id
+    columns, batches = export_batches(EXPORT_MODELS[kind], batch_size or current_app.config['EXPORT_BATCH_SIZE'], since_id, since)
+
+    def counted(batches):
+        nonlocal exported, last_id
+        for batch in batches:
+            exported += len(batch)
+            last_id = batch[-1][0]
+            yield batch
+
+    if file_format == 'parquet':
+        catalog_export.write_parquet(path, EXPORT_MODELS[kind].__table__.columns, counted(batches))
+    else:
+        with click.open_file(path, 'w', encoding='utf-8') as file:
+            for chunk in catalog_export.text_chunks(file_format, columns, counted(batches)):
+                file.write(chunk)
+
+    elapsed = time.perf_counter() - started
+    click.echo(f"{exported} rows exported in {elapsed:.2f}s "
+               f"({exported / elapsed if elapsed else 0:,.0f} rows/s), last id {last_id}", err=True)
+
+
+#----------------------------------------------------------------------------#
+# App Factory.
+#----------------------------------------------------------------------------#
+
+def create_app(config='config', overrides=None):
+    """Build a Fyyur app from a config module or object, plus optional overrides.
+
+    Unless SQLALCHEMY_ENGINE_OPTIONS is set, the engine's pool, pre-ping and
+    statement timeout come from the DB_* settings (see db_pool.engine_options).
+    Without a SECRET_KEY each app gets a random one, unless replicas are
+    configured, which is a ValueError.
+    """
+    app = Flask(__name__)
+    app.jinja_environment = TimedEnvironment
+    app.config.from_object(config)
+    app.config.update(overrides or {})
+    if not app.config['SECRET_KEY']:
+        if app.config['DB_REPLICA_URIS']:
+            # A per-process key would drop the read-your-writes stickiness kept in the session
+            raise ValueError("SECRET_KEY must be set, the same in every process, when DB_REPLICA_URIS is")
+        app.config['SECRET_KEY'] = os.urandom(32)
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in app.config:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    moment.init_app(app)
+    app.extensions['fyyur'] = {
+        'search_indexes': {Venue: NgramIndex(), Artist: NgramIndex()},
+        'search_indexes_built': time.monotonic(),
+        'search_indexes_refreshing': threading.Lock(),
+        'view_cache': make_cache(app.config),
+        'page_cache': make_cache(app.config, max_entries=app.config['PAGE_CACHE_MAX_ENTRIES']),
+        'data_version': make_version_token(app.config),
+        'datetime_formatter': DateTimeFormatter(app.config['DATETIME_LOCALE'], app.config['DATETIME_TIMEZONE']),
+        'assets': assets.load_manifest(app.static_folder),
+        'images': images.load_manifest(app.static_folder),
+        'thumbnail_cache': image_proxy.ImageProxy(
+            app.config['THUMBNAIL_CACHE_DIR'],
+            app.config['THUMBNAIL_CACHE_MAX_BYTES'],
+            timeout=app.config['THUMBNAIL_FETCH_TIMEOUT'],
+            max_source_bytes=app.config['THUMBNAIL_MAX_SOURCE_BYTES'],
+            allow_private=app.config['THUMBNAIL_ALLOW_PRIVATE_HOSTS']
+        ),
+        'replicas': ReplicaSet(
+            app.config['DB_REPLICA_URIS'],
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'],
+            max_lag_seconds=app.config['REPLICA_MAX_LAG_SECONDS'],
+            check_interval=app.config['REPLICA_CHECK_INTERVAL']
+        )
+    }
+    app.extensions['fyyur']['sql_profiles'] = (
+        collections.deque(maxlen=app.config['SQL_PROFILE_HISTORY']) if app.config['SQL_PROFILE_ENDPOINT'] else None
     )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+    sql_profile.install()
+    app.register_blueprint(main)
+
+    if not app.debug:
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+
+    return app
 
 
 #----------------------------------------------------------------------------#
@@ -608,11 +1888,11 @@ if not app.debug:
 #----------------------------------------------------------------------------#
 # Default port:
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
 
     # Or specify port manually:
     '''
     if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
     '''
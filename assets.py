@@ -0,0 +1,156 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+
+#----------------------------------------------------------------------------#
+# Static asset pipeline.
+#----------------------------------------------------------------------------#
+
+# Build output and its manifest, relative to the static folder
+DIST_DIR = 'dist'
+MANIFEST = os.path.join(DIST_DIR, 'manifest.json')
+
+# Bundles, by the name templates ask for, and their sources in page order
+BUNDLES = {
+    "main.css": (
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css'
+    ),
+    "head.js": (
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+        'js/script.js'
+    ),
+    "body.js": (
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js'
+    )
+}
+
+# Files templates load on their own, fingerprinted as they are
+FILES = (
+    'js/libs/jquery-1.11.1.min.js',
+    'js/libs/respond-1.4.2.min.js'
+)
+
+# Outputs worth precompressing
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json')
+
+_CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(text):
+    """CSS without comments (except /*! licenses) and redundant whitespace."""
+    try:
+        # Handles corner cases the fallback leaves alone
+        import rcssmin
+    except ImportError:
+        text = _CSS_COMMENT.sub('', text)
+        text = _CSS_SPACE.sub(' ', text)
+        return _CSS_PUNCTUATION.sub(r'\1', text).replace(';}', '}').strip()
+    return rcssmin.cssmin(text, keep_bang_comments=True)
+
+
+def minify_js(text):
+    """Minified JavaScript with rjsmin, or text unchanged if it isn't installed."""
+    try:
+        # Regex minification of JavaScript isn't safe, so there's no fallback
+        import rjsmin
+    except ImportError:
+        return text
+    return rjsmin.jsmin(text, keep_bang_comments=True)
+
+
+def fingerprinted(name, content):
+    """name with a hash of content before its extension, e.g. main.3f2a9c1e7b4d.css."""
+    stem, extension = os.path.splitext(os.path.basename(name))
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{extension}"
+
+
+def write_compressed(path, content):
+    """Write path.gz and, with the brotli package installed, path.br beside path."""
+    with open(path + '.gz', 'wb') as file:
+        file.write(gzip.compress(content, compresslevel=9, mtime=0))
+    try:
+        # Browsers fall back to gzip without it
+        import brotli
+    except ImportError:
+        return
+    with open(path + '.br', 'wb') as file:
+        file.write(brotli.compress(content))
+
+
+def _read(static_folder, name):
+    with open(os.path.join(static_folder, name), 'rb') as file:
+        return file.read()
+
+
+def build(static_folder):
+    """Write bundles and fingerprinted files to DIST_DIR and return the new manifest.
+
+    Outputs of earlier builds are left for pages still cached by clients.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    outputs = {}
+
+    for name, sources in BUNDLES.items():
+        texts = [_read(static_folder, source).decode('utf-8') for source in sources]
+        if name.endswith('.css'):
+            content = '\n'.join(minify_css(text) for text in texts)
+        else:
+            # Guard against sources that end without a semicolon
+            content = ';\n'.join(minify_js(text) for text in texts)
+        outputs[name] = content.encode('utf-8')
+
+    for name in FILES:
+        outputs[name] = _read(static_folder, name)
+
+    manifest = {}
+    for name, content in outputs.items():
+        filename = fingerprinted(name, content)
+        path = os.path.join(dist, filename)
+        with open(path, 'wb') as file:
+            file.write(content)
+        if filename.endswith(COMPRESSIBLE):
+            write_compressed(path, content)
+        manifest[name] = f"{DIST_DIR}/{filename}"
+
+    with open(os.path.join(static_folder, MANIFEST), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """The manifest of the last build, or {} if assets were never built."""
+    try:
+        with open(os.path.join(static_folder, MANIFEST), encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_paths(manifest, name):
+    """Static paths to load for name: its build output, or its sources before a build."""
+    if name in manifest:
+        return [manifest[name]]
+    return list(BUNDLES.get(name, (name,)))
+
+
+def precompressed(static_folder, filename, accept_encoding):
+    """(filename to send, Content-Encoding or None), preferring brotli, then gzip."""
+    accepted = {
+        part.split(';')[0].strip() for part in accept_encoding.split(',')
+        if not re.search(r';\s*q=0(\.0*)?\s*$', part)
+    }
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in accepted and os.path.isfile(os.path.join(static_folder, filename + suffix)):
+            return filename + suffix, encoding
+    return filename, None
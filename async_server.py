@@ -0,0 +1,45 @@
+"""Serve Fyyur from gevent greenlets instead of worker threads.
+
+psycopg2 is switched to its asynchronous mode, so a request waiting on
+PostgreSQL yields to the others and one process can keep many requests in
+flight. Size DB_POOL_SIZE and DB_MAX_OVERFLOW for the concurrency allowed.
+Needs gevent and psycogreen, from requirements-extra.txt:
+
+    $ pip install -r requirements-extra.txt
+    $ python async_server.py --port 5000 --concurrency 500
+"""
+# Has to run before anything imports socket, threading or psycopg2
+from gevent import monkey
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg
+patch_psycopg()
+
+import argparse
+
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+
+from app import create_app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve Fyyur with gevent.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=1000, help='Most requests handled at once.')
+    parser.add_argument('--access-log', action='store_true', help='Log each request to stderr.')
+    args = parser.parse_args(argv)
+
+    server = WSGIServer(
+        (args.host, args.port),
+        create_app(),
+        spawn=Pool(args.concurrency),
+        log='default' if args.access_log else None
+    )
+    print(f"Serving on http://{args.host}:{args.port} (up to {args.concurrency} concurrent requests)")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""Seeded synthetic catalogs for benchmarks.
+
+Loads venues, artists and shows into DATABASE_URL (migrated with
+`flask db upgrade`). The same seed, sizes and anchor date always produce the
+same catalog:
+
+    $ python -m benchmarks.generator --venues 10000 --artists 100000 --shows 1000000 --seed 1
+"""
+import argparse
+import datetime
+import itertools
+import random
+import sys
+
+from app import create_app, db, Venue, Artist, Show, UpcomingSweep, rebuild_upcoming_counts
+from catalog_import import chunked, insert_rows
+from forms import VenueForm
+
+GENRES = [value for value, _ in VenueForm.genres.kwargs['choices']]
+
+# Listed roughly by size; earlier cities get more venues and artists
+CITIES = (
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+    ('San Francisco', 'CA'), ('Seattle', 'WA'), ('Austin', 'TX'), ('Nashville', 'TN'),
+    ('Atlanta', 'GA'), ('Boston', 'MA'), ('Denver', 'CO'), ('Portland', 'OR'),
+    ('New Orleans', 'LA'), ('Philadelphia', 'PA'), ('Detroit', 'MI'), ('Minneapolis', 'MN'),
+    ('Miami', 'FL'), ('Brooklyn', 'NY'), ('Oakland', 'CA'), ('Memphis', 'TN')
+)
+CITY_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(CITIES) + 1)))
+
+ADJECTIVES = (
+    'Blue', 'Golden', 'Velvet', 'Electric', 'Silver', 'Midnight', 'Crimson', 'Lucky',
+    'Wild', 'Quiet', 'Neon', 'Broken', 'Little', 'Grand', 'Hollow', 'Painted'
+)
+NOUNS = (
+    'Owl', 'Fox', 'Anchor', 'Lantern', 'Harbor', 'Crow', 'River', 'Garden',
+    'Mirror', 'Engine', 'Orchard', 'Tiger', 'Comet', 'Bridge', 'Rose', 'Wolf'
+)
+VENUE_KINDS = ('Hall', 'Room', 'Lounge', 'Club', 'Theatre', 'Tavern', 'Ballroom', 'Stage')
+FIRST_NAMES = (
+    'Ava', 'Ben', 'Chloe', 'Diego', 'Emma', 'Felix', 'Grace', 'Hugo',
+    'Iris', 'Jonas', 'Kai', 'Lena', 'Milo', 'Nora', 'Omar', 'Priya'
+)
+LAST_NAMES = (
+    'Adams', 'Brooks', 'Chen', 'Duarte', 'Ellis', 'Fischer', 'Garcia', 'Hayes',
+    'Ito', 'Jensen', 'Kowalski', 'Lopez', 'Moreau', 'Novak', 'Okafor', 'Park'
+)
+
+# Shows start between this long before and after the anchor date
+PAST_SPAN = datetime.timedelta(days=730)
+FUTURE_SPAN = datetime.timedelta(days=365)
+
+
+def _place(rng):
+    return rng.choices(CITIES, cum_weights=CITY_WEIGHTS)[0]
+
+
+def _genres(rng):
+    return rng.sample(GENRES, rng.choice((1, 1, 2, 2, 3)))
+
+
+def venue_rows(rng, count):
+    for number in range(count):
+        city, state = _place(rng)
+        name = f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(VENUE_KINDS)}"
+        seeking_talent = rng.random() < 0.4
+        yield {
+            "name": name,
+            "city": city,
+            "state": state,
+            "address": f"{rng.randint(1, 9999)} {rng.choice(NOUNS)} Street",
+            "phone": f"{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}",
+            "image_link": f"https://picsum.photos/seed/venue{number}/600/400",
+            "genres": _genres(rng),
+            "website": f"https://www.example.com/venues/{number}",
+            "facebook_link": f"https://www.facebook.com/venue{number}",
+            "seeking_talent": seeking_talent,
+            "seeking_description": 'Looking for local acts.' if seeking_talent else None
+        }
+
+
+def artist_rows(rng, count):
+    for number in range(count):
+        city, state = _place(rng)
+        if rng.random() < 0.5:
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        else:
+            name = f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}s"
+        seeking_venue = rng.random() < 0.3
+        yield {
+            "name": name,
+            "city": city,
+            "state": state,
+            "phone": f"{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}",
+            "genres": _genres(rng),
+            "image_link": f"https://picsum.photos/seed/artist{number}/600/400",
+            "facebook_link": f"https://www.facebook.com/artist{number}",
+            "seeking_venue": seeking_venue,
+            "seeking_description": 'Looking for shows this season.' if seeking_venue else None
+        }
+
+
+def _popularity(rng, ids):
+    # Long-tailed, so a few venues and artists get most of the shows
+    return list(itertools.accumulate(rng.paretovariate(1.2) for _ in ids))
+
+
+def show_rows(rng, count, venue_ids, artist_ids, anchor):
+    venue_weights = _popularity(rng, venue_ids)
+    artist_weights = _popularity(rng, artist_ids)
+    span_slots = int((PAST_SPAN + FUTURE_SPAN).total_seconds() // 1800)
+    first_slot = anchor - PAST_SPAN
+
+    for batch in chunked(range(count), 10000):
+        venues = rng.choices(venue_ids, cum_weights=venue_weights, k=len(batch))
+        artists = rng.choices(artist_ids, cum_weights=artist_weights, k=len(batch))
+        for venue_id, artist_id in zip(venues, artists):
+            yield {
+                "venue_id": venue_id,
+                "artist_id": artist_id,
+                "start_time": first_slot + datetime.timedelta(minutes=30 * rng.randrange(span_slots))
+            }
+
+
+def clear_catalog(session):
+    if session.bind.dialect.name == 'postgresql':
+        session.execute('TRUNCATE "Show", "Venue", "Artist" RESTART IDENTITY')
+    else:
+        for model in (Show, Venue, Artist):
+            session.query(model).delete()
+    session.commit()
+
+
+def _insert(session, model, rows, batch_size, progress):
+    first_id = session.query(db.func.max(model.id)).scalar() or 0
+    inserted = 0
+    for chunk in chunked(rows, batch_size):
+        insert_rows(session, model.__table__, chunk)
+        session.commit()
+        inserted += len(chunk)
+        progress(f"{model.__tablename__}: {inserted:,}")
+    return [id for id, in session.query(model.id).filter(model.id > first_id).order_by(model.id)]
+
+
+def seed_catalog(session, venues, artists, shows, seed=1, anchor=None, batch_size=5000, progress=None):
+    """Insert a generated catalog and recount upcoming shows; returns the new venue and artist ids."""
+    rng = random.Random(seed)
+    anchor = anchor or datetime.datetime.now(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    progress = progress or (lambda message: None)
+
+    venue_ids = _insert(session, Venue, venue_rows(rng, venues), batch_size, progress)
+    artist_ids = _insert(session, Artist, artist_rows(rng, artists), batch_size, progress)
+    if shows and venue_ids and artist_ids:
+        _insert(session, Show, show_rows(rng, shows, venue_ids, artist_ids, anchor), batch_size, progress)
+
+    if UpcomingSweep.query.get(1) is None:
+        session.add(UpcomingSweep(id=1, swept_until=anchor))
+        session.commit()
+    rebuild_upcoming_counts()
+    return venue_ids, artist_ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load a synthetic Fyyur catalog.')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--anchor', type=datetime.date.fromisoformat,
+                        help='Date the past/upcoming split is generated around (default today).')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--truncate', action='store_true', help='Delete the existing catalog first.')
+    args = parser.parse_args(argv)
+
+    anchor = None
+    if args.anchor:
+        anchor = datetime.datetime.combine(args.anchor, datetime.time(), tzinfo=datetime.timezone.utc)
+
+    with create_app().app_context():
+        if args.truncate:
+            clear_catalog(db.session)
+        seed_catalog(
+            db.session, args.venues, args.artists, args.shows, seed=args.seed, anchor=anchor,
+            batch_size=args.batch_size, progress=lambda message: print(message, file=sys.stderr, end='\r')
+        )
+    print(f"\nLoaded {args.venues:,} venues, {args.artists:,} artists and {args.shows:,} shows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""Drive every route in app.py and report latency, throughput and queries per request.
+
+Runs against DATABASE_URL, seeded with benchmarks.generator. The client
+driver goes through Flask's test client; the server driver through a real
+threaded WSGI server on a local port:
+
+    $ python -m benchmarks.harness --driver client --requests 50 --output report.json
+    $ python -m benchmarks.harness --driver server --concurrency 16 --baseline baseline.json
+
+Queries per request are read from the X-SQL-Statements header, so the
+statements of streamed bodies (API lists, exports) are not counted. Write
+routes only run with --include-writes. Exits 1 when a request fails or, with
+--baseline, when a route regresses.
+"""
+import argparse
+import collections
+import concurrent.futures
+import datetime
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app, db, Venue, Artist, Show
+from benchmarks import report
+
+Scenario = collections.namedtuple('Scenario', 'name endpoint method path data')
+
+# Routes the harness leaves out on purpose
+SKIPPED_ENDPOINTS = {
+    'main.built_asset': 'served by the web server in production',
+    'main.delete_venue': 'destroys the catalog it measures',
+    'main.image_variant': 'needs Pillow, then served from a disk cache',
+    'main.recent_sql': 'only served with SQL_PROFILE_ENDPOINT on',
+    'main.thumbnail': 'fetches remote images on first request',
+    'static': 'served by the web server in production'
+}
+
+
+def sample_catalog():
+    """Busiest venue and artist ids, and search terms that match them."""
+    venue = db.session.query(Venue.id, Venue.name).order_by(Venue.num_upcoming_shows.desc(), Venue.id).first()
+    artist = db.session.query(Artist.id, Artist.name).order_by(Artist.num_upcoming_shows.desc(), Artist.id).first()
+    if venue is None or artist is None:
+        raise SystemExit('The catalog is empty; load one with python -m benchmarks.generator')
+    return {
+        "venue_id": venue.id,
+        "artist_id": artist.id,
+        "venue_term": venue.name.split()[-1],
+        "artist_term": artist.name.split()[-1]
+    }
+
+
+def scenarios(sample, include_writes=False):
+    venue_id, artist_id = sample['venue_id'], sample['artist_id']
+    reads = [
+        Scenario('index', 'main.index', 'GET', '/', None),
+        Scenario('venues', 'main.venues', 'GET', '/venues', None),
+        Scenario('search_venues', 'main.search_venues', 'POST', '/venues/search', {'search_term': sample['venue_term']}),
+        Scenario('show_venue', 'main.show_venue', 'GET', f'/venues/{venue_id}', None),
+        Scenario('create_venue_form', 'main.create_venue_form', 'GET', '/venues/create', None),
+        Scenario('edit_venue', 'main.edit_venue', 'GET', f'/venues/{venue_id}/edit', None),
+        Scenario('artists', 'main.artists', 'GET', '/artists', None),
+        Scenario('search_artists', 'main.search_artists', 'POST', '/artists/search', {'search_term': sample['artist_term']}),
+        Scenario('show_artist', 'main.show_artist', 'GET', f'/artists/{artist_id}', None),
+        Scenario('edit_artist', 'main.edit_artist', 'GET', f'/artists/{artist_id}/edit', None),
+        Scenario('create_artist_form', 'main.create_artist_form', 'GET', '/artists/create', None),
+        Scenario('shows', 'main.shows', 'GET', '/shows', None),
+        Scenario('create_shows', 'main.create_shows', 'GET', '/shows/create', None),
+        Scenario('api_venues', 'main.api_list', 'GET', '/api/v1/venues', None),
+        Scenario('api_artists', 'main.api_list', 'GET', '/api/v1/artists', None),
+        Scenario('api_shows', 'main.api_list', 'GET', '/api/v1/shows', None),
+        Scenario('api_export_venues', 'main.api_export', 'GET', '/api/v1/export/venues?format=ndjson', None),
+        Scenario('api_venue', 'main.api_venue', 'GET', f'/api/v1/venues/{venue_id}', None),
+        Scenario('api_artist', 'main.api_artist', 'GET', f'/api/v1/artists/{artist_id}', None),
+        Scenario('cache_stats', 'main.cache_stats', 'GET', '/cache/stats', None),
+        Scenario('pool_stats', 'main.pool_stats', 'GET', '/pool/stats', None),
+        Scenario('metrics', 'main.prometheus_metrics', 'GET', '/metrics', None)
+    ]
+    if not include_writes:
+        return reads
+
+    start_time = (datetime.datetime.now() + datetime.timedelta(days=30)).strftime('%Y-%m-%d %H:%M')
+    venue_form = {
+        'name': 'Benchmark Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main Street',
+        'phone': '512-555-0100', 'image_link': 'https://picsum.photos/600/400', 'genres': 'Jazz',
+        'website': '', 'facebook_link': ''
+    }
+    artist_form = {
+        'name': 'The Benchmarks', 'city': 'Austin', 'state': 'TX', 'phone': '512-555-0101',
+        'genres': 'Jazz', 'facebook_link': '', 'image_link': 'https://picsum.photos/600/400'
+    }
+    return reads + [
+        Scenario('create_venue_submission', 'main.create_venue_submission', 'POST', '/venues/create', venue_form),
+        Scenario('create_artist_submission', 'main.create_artist_submission', 'POST', '/artists/create', artist_form),
+        Scenario('create_show_submission', 'main.create_show_submission', 'POST', '/shows/create',
+                 {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time}),
+        Scenario('edit_venue_submission', 'main.edit_venue_submission', 'POST', f'/venues/{venue_id}/edit', venue_form),
+        Scenario('edit_artist_submission', 'main.edit_artist_submission', 'POST', f'/artists/{artist_id}/edit', artist_form)
+    ]
+
+
+def uncovered_endpoints(app, covered):
+    """Endpoints with neither a scenario nor a reason to skip them."""
+    return sorted(set(app.view_functions) - set(covered) - set(SKIPPED_ENDPOINTS))
+
+
+def _statements(headers):
+    value = headers.get('X-SQL-Statements')
+    return None if value is None else int(value)
+
+
+class ClientDriver:
+    """Sends requests through a Flask test client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def send(self, scenario):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+
+        started = time.perf_counter()
+        response = client.open(scenario.path, method=scenario.method, data=scenario.data)
+        response.get_data()
+        return time.perf_counter() - started, response.status_code, _statements(response.headers)
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class ServerDriver:
+    """Sends HTTP requests to the app served by a threaded WSGI server."""
+
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def send(self, scenario):
+        data = urllib.parse.urlencode(scenario.data).encode() if scenario.data is not None else None
+        request = urllib.request.Request(self.base_url + scenario.path, data=data, method=scenario.method)
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as error:
+            status, headers = error.code, error.headers
+        except (urllib.error.URLError, OSError):
+            status, headers = None, {}
+        return time.perf_counter() - started, status, _statements(headers)
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run(driver, scenario_list, requests, concurrency):
+    """{scenario name: (samples, elapsed)}, one route at a time after one warm-up request each."""
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for scenario in scenario_list:
+            driver.send(scenario)
+            started = time.perf_counter()
+            samples = list(executor.map(driver.send, [scenario] * requests))
+            results[scenario.name] = (samples, time.perf_counter() - started)
+            print(f"{scenario.name}: done", file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every Fyyur route.')
+    parser.add_argument('--driver', choices=('client', 'server'), default='client')
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per route.')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--routes', nargs='+', metavar='NAME', help='Only run these scenarios.')
+    parser.add_argument('--include-writes', action='store_true', help='Also run the create and edit submissions.')
+    parser.add_argument('--no-cache', action='store_true', help='Expire cached pages and view models at once.')
+    parser.add_argument('--output', metavar='PATH', help='Save the report as JSON.')
+    parser.add_argument('--baseline', metavar='PATH', help='Compare against a saved report.')
+    parser.add_argument('--tolerance', type=float, default=report.DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    overrides = {
+        'SQL_PROFILE_HEADERS': True,
+        'SQL_WARN_STATEMENTS': None,
+        'SQL_WARN_DB_MS': None,
+        'SQL_WARN_REPEATS': None,
+        'PROPAGATE_EXCEPTIONS': False
+    }
+    if args.no_cache:
+        overrides['CACHE_TTL'] = 0
+    app = create_app(overrides=overrides)
+
+    with app.app_context():
+        sample = sample_catalog()
+        counts = {model.__tablename__: model.query.count() for model in (Venue, Artist, Show)}
+    scenario_list = scenarios(sample, args.include_writes)
+    for endpoint in uncovered_endpoints(app, [scenario.endpoint for scenario in scenario_list]):
+        print(f"warning: no scenario covers {endpoint}", file=sys.stderr)
+    if args.routes:
+        scenario_list = [scenario for scenario in scenario_list if scenario.name in args.routes]
+
+    driver = ClientDriver(app) if args.driver == 'client' else ServerDriver(app)
+    try:
+        results = run(driver, scenario_list, args.requests, args.concurrency)
+    finally:
+        driver.close()
+
+    current = report.build_report(results, {
+        "driver": args.driver,
+        "concurrency": args.concurrency,
+        "requests_per_route": args.requests,
+        "cache": not args.no_cache,
+        "catalog": counts
+    })
+    print(report.format_table(current))
+    if args.output:
+        report.save(current, args.output)
+
+    failed = current['total']['errors'] > 0
+    if args.baseline:
+        regressions = report.compare(current, report.load(args.baseline), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        failed = failed or bool(regressions)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
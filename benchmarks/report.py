@@ -0,0 +1,125 @@
+"""Latency, throughput and queries-per-request reports, saved as JSON.
+
+Compare a report against a stored baseline, exiting 1 on regressions:
+
+    $ python -m benchmarks.report report.json --baseline baseline.json
+"""
+import argparse
+import json
+import math
+import sys
+
+# Relative slowdown (p95 latency) or throughput drop allowed against a baseline
+DEFAULT_TOLERANCE = 0.2
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = math.ceil(fraction * len(sorted_values)) - 1
+    return sorted_values[min(max(index, 0), len(sorted_values) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Summary of (latency seconds, status or None, statements or None) samples."""
+    latencies = sorted(latency for latency, _, _ in samples)
+    statements = [count for _, _, count in samples if count is not None]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, status, _ in samples if status is None or status >= 400),
+        "seconds": elapsed,
+        "requests_per_second": len(samples) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            name: None if value is None else value * 1000
+            for name, value in (
+                ('p50', percentile(latencies, 0.50)),
+                ('p95', percentile(latencies, 0.95)),
+                ('p99', percentile(latencies, 0.99)),
+                ('max', latencies[-1] if latencies else None)
+            )
+        },
+        "queries_per_request": sum(statements) / len(statements) if statements else None
+    }
+
+
+def build_report(route_results, meta):
+    """Report from {route: (samples, elapsed seconds)}."""
+    routes = {route: summarize(samples, elapsed) for route, (samples, elapsed) in route_results.items()}
+    all_samples = [sample for samples, _ in route_results.values() for sample in samples]
+    elapsed = sum(elapsed for _, elapsed in route_results.values())
+    return {"meta": meta, "routes": routes, "total": summarize(all_samples, elapsed)}
+
+
+def save(report, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Regressions of report against baseline, one message each.
+
+    Any growth in queries per request counts, since it usually means a query
+    moved into a loop; latency and throughput are allowed tolerance.
+    """
+    regressions = []
+    for route, current in sorted(report['routes'].items()):
+        previous = baseline['routes'].get(route)
+        if previous is None:
+            continue
+
+        current_p95, previous_p95 = current['latency_ms']['p95'], previous['latency_ms']['p95']
+        if current_p95 is not None and previous_p95 and current_p95 > previous_p95 * (1 + tolerance):
+            regressions.append(f"{route}: p95 {previous_p95:.1f}ms -> {current_p95:.1f}ms")
+
+        if current['requests_per_second'] < previous['requests_per_second'] * (1 - tolerance):
+            regressions.append(
+                f"{route}: {previous['requests_per_second']:.1f} -> {current['requests_per_second']:.1f} req/s"
+            )
+
+        current_queries, previous_queries = current['queries_per_request'], previous['queries_per_request']
+        if current_queries is not None and previous_queries is not None and current_queries > previous_queries + 0.01:
+            regressions.append(f"{route}: {previous_queries:.1f} -> {current_queries:.1f} queries/request")
+
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{route}: {previous['errors']} -> {current['errors']} errors")
+    return regressions
+
+
+def format_table(report):
+    lines = [f"{'route':<28} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'errors':>7}"]
+    for route, summary in sorted(report['routes'].items()) + [('TOTAL', report['total'])]:
+        latency = summary['latency_ms']
+        queries = summary['queries_per_request']
+        lines.append(
+            f"{route:<28} {summary['requests_per_second']:>9.1f} {latency['p50'] or 0:>9.1f} "
+            f"{latency['p95'] or 0:>9.1f} {latency['p99'] or 0:>9.1f} "
+            f"{'-' if queries is None else format(queries, '.1f'):>8} {summary['errors']:>7}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print a benchmark report and compare it to a baseline.')
+    parser.add_argument('report')
+    parser.add_argument('--baseline', help='Report to compare against.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    report = load(args.report)
+    print(format_table(report))
+    if args.baseline:
+        regressions = compare(report, load(args.baseline), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Compare the threaded (sync) and gevent (async) servers under concurrent load.
+
+Starts each server in turn against the configured database (DATABASE_URL),
+sends --requests GETs spread over --paths from --concurrency client threads
+and prints throughput and latency percentiles. The servers run with
+CACHE_TTL=0, so every request does its database work; --cache keeps the
+configured caches, which mostly measures cache hits:
+
+    $ python -m benchmarks.serving --requests 2000 --concurrency 100
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.report import summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PATHS = (
+    '/venues', '/artists', '/shows',
+    '/api/v1/venues', '/api/v1/artists', '/api/v1/shows'
+)
+
+SYNC_SERVER = (
+    'import sys; from app import create_app; '
+    'create_app().run(port=int(sys.argv[1]), threaded=True, debug=False)'
+)
+
+
+def server_command(mode, port, concurrency):
+    if mode == 'sync':
+        return [sys.executable, '-c', SYNC_SERVER, str(port)]
+    return [sys.executable, 'async_server.py', '--port', str(port), '--concurrency', str(concurrency)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server did not listen on port {port} within {timeout}s")
+
+
+def fetch(url, timeout):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    except (urllib.error.URLError, OSError):
+        status = None
+    return time.perf_counter() - started, status, None
+
+
+def run_load(base_url, paths, requests, concurrency, timeout=30):
+    """Latency and throughput of requests GETs over paths at concurrency."""
+    urls = [base_url + paths[number % len(paths)] for number in range(requests)]
+
+    # Warm up caches and connection pools before timing
+    for path in paths:
+        fetch(base_url + path, timeout)
+
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda url: fetch(url, timeout), urls))
+    elapsed = time.perf_counter() - started
+
+    return summarize(results, elapsed)
+
+
+def benchmark(mode, paths, requests, concurrency, cache=False):
+    port = free_port()
+    env = dict(os.environ) if cache else dict(os.environ, CACHE_TTL='0')
+    process = subprocess.Popen(
+        server_command(mode, port, concurrency),
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(port, process)
+        return run_load(f"http://127.0.0.1:{port}", paths, requests, concurrency)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the sync and async servers.')
+    parser.add_argument('--modes', nargs='+', choices=('sync', 'async'), default=['sync', 'async'])
+    parser.add_argument('--paths', nargs='+', default=list(DEFAULT_PATHS))
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--cache', action='store_true', help='Keep the page and view model caches on.')
+    parser.add_argument('--json', metavar='PATH', help='Also write the results to PATH as JSON.')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for mode in args.modes:
+        results[mode] = result = benchmark(mode, args.paths, args.requests, args.concurrency, args.cache)
+        latency = result['latency_ms']
+        print(
+            f"{mode:>5}: {result['requests_per_second']:8.1f} req/s  "
+            f"p50 {latency['p50'] or 0:7.1f}ms  p95 {latency['p95'] or 0:7.1f}ms  "
+            f"p99 {latency['p99'] or 0:7.1f}ms  errors {result['errors']}"
+        )
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+from collections import OrderedDict
+import pickle
+import threading
+import time
+import uuid
+
+#----------------------------------------------------------------------------#
+# Caches.
+#----------------------------------------------------------------------------#
+
+class CacheStats:
+    """Hit, miss and eviction counters shared by the cache backends."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class LRUCache:
+    """Bounded in-process cache with per-entry TTL and least-recently-used eviction.
+
+    Entries are only invalidated in the process that calls delete(), so with
+    several workers the TTL bounds how stale another worker's copy can be.
+    """
+
+    def __init__(self, max_entries=10000, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedCache:
+    """Cache kept in a shared key-value store so every worker sees invalidations.
+
+    client needs the get/setex/delete subset of redis.Redis; LocalClient stands
+    in for it in development and tests. Evictions are the store's business and
+    are not counted here.
+    """
+
+    def __init__(self, client, default_ttl=300, prefix='fyyur:'):
+        self.client = client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+
+    def get(self, key):
+        payload = self.client.get(self._key(key))
+        if payload is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return pickle.loads(payload)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        # A zero TTL means don't cache, as with LRUCache
+        if ttl <= 0:
+            return
+        self.client.setex(self._key(key), max(int(ttl), 1), pickle.dumps(value))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self._key(key) for key in keys])
+
+    def _key(self, key):
+        return self.prefix + ':'.join(str(part) for part in key)
+
+
+class LocalClient:
+    """In-memory stand-in for the redis.Redis calls SharedCache makes."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            entry = self._values.get(name)
+            if entry is None or entry[0] <= time.monotonic():
+                self._values.pop(name, None)
+                return None
+            return entry[1]
+
+    def setex(self, name, time_seconds, value):
+        with self._lock:
+            self._values[name] = (time.monotonic() + time_seconds, value)
+
+    def set(self, name, value):
+        with self._lock:
+            self._values[name] = (float('inf'), value)
+
+    def delete(self, *names):
+        with self._lock:
+            for name in names:
+                self._values.pop(name, None)
+
+
+class VersionToken:
+    """Token replaced by bump(), kept apart from any cache so eviction or a TTL can't reset it.
+
+    Without a client the token lives in this process, and bumps made by other
+    processes (workers, CLI commands) never reach it; with one (redis.Redis or
+    LocalClient) it is stored without expiry and shared by every worker.
+    """
+
+    def __init__(self, client=None, key='fyyur:data_version'):
+        self.client = client
+        self.key = key
+        self.shared = client is not None
+        self._value = None
+
+    def get(self):
+        if self.client is None:
+            value = self._value
+        else:
+            value = self.client.get(self.key)
+            if isinstance(value, bytes):
+                value = value.decode('ascii')
+        return value if value is not None else self.bump()
+
+    def bump(self):
+        value = uuid.uuid4().hex
+        if self.client is None:
+            self._value = value
+        else:
+            self.client.set(self.key, value)
+        return value
+
+
+def make_cache(config, max_entries=None):
+    """Cache backend selected by CACHE_BACKEND: 'memory', 'local' or 'redis'.
+
+    max_entries overrides CACHE_MAX_ENTRIES for the in-process backend.
+    """
+    backend = config.get('CACHE_BACKEND', 'memory')
+    ttl = config.get('CACHE_TTL', 300)
+
+    if backend == 'memory':
+        return LRUCache(max_entries or config.get('CACHE_MAX_ENTRIES', 10000), ttl)
+    if backend == 'local':
+        return SharedCache(LocalClient(), ttl)
+    if backend == 'redis':
+        return SharedCache(redis_client(config), ttl)
+
+    raise ValueError(f"Unknown CACHE_BACKEND {backend!r}")
+
+
+def make_version_token(config):
+    """VersionToken stored alongside the CACHE_BACKEND cache."""
+    backend = config.get('CACHE_BACKEND', 'memory')
+    if backend == 'redis':
+        return VersionToken(redis_client(config))
+    return VersionToken()
+
+
+def redis_client(config):
+    """redis.Redis for CACHE_REDIS_URL; redis is in requirements-extra.txt."""
+    import redis
+    return redis.Redis.from_url(config['CACHE_REDIS_URL'])
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+
+from sqlalchemy import types
+
+#----------------------------------------------------------------------------#
+# Bulk catalog export helpers.
+#----------------------------------------------------------------------------#
+
+FORMATS = ('ndjson', 'csv', 'parquet')
+
+
+def _json_default(value):
+    return value.isoformat()
+
+
+def _csv_value(value):
+    # Lists are joined the way catalog_import.split_list() reads them back
+    if isinstance(value, list):
+        return ';'.join(value)
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def ndjson_chunks(columns, batches):
+    """One string of NDJSON lines per batch of row tuples."""
+    for batch in batches:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), separators=(',', ':'), default=_json_default) + '\n'
+            for row in batch
+        )
+
+
+def csv_chunks(columns, batches):
+    """A header, then one string of CSV lines per batch of row tuples."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows([_csv_value(value) for value in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _arrow_type(pyarrow, column_type):
+    if isinstance(column_type, types.ARRAY):
+        return pyarrow.list_(_arrow_type(pyarrow, column_type.item_type))
+    if isinstance(column_type, types.Boolean):
+        return pyarrow.bool_()
+    if isinstance(column_type, types.Integer):
+        return pyarrow.int64()
+    if isinstance(column_type, (types.Float, types.Numeric)):
+        return pyarrow.float64()
+    if isinstance(column_type, types.DateTime):
+        return pyarrow.timestamp('us', tz='UTC' if column_type.timezone else None)
+    if isinstance(column_type, types.Date):
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+def parquet_schema(table_columns):
+    """pyarrow schema of SQLAlchemy columns, so a batch where a column is all null keeps its type."""
+    import pyarrow
+    return pyarrow.schema([
+        pyarrow.field(column.name, _arrow_type(pyarrow, column.type), nullable=column.nullable)
+        for column in table_columns
+    ])
+
+
+def write_parquet(path, table_columns, batches):
+    """Write batches of rows of table_columns to a Parquet file, one row group per batch. Needs pyarrow."""
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = parquet_schema(table_columns)
+    with pyarrow.parquet.ParquetWriter(path, schema, compression='zstd') as writer:
+        for batch in batches:
+            writer.write_table(pyarrow.Table.from_pydict({
+                field.name: [row[position] for row in batch] for position, field in enumerate(schema)
+            }, schema=schema))
+
+
+def text_chunks(file_format, columns, batches):
+    """ndjson_chunks() or csv_chunks() by name."""
+    if file_format == 'ndjson':
+        return ndjson_chunks(columns, batches)
+    if file_format == 'csv':
+        return csv_chunks(columns, batches)
+    raise ValueError(f"{file_format} is not a streamable text format")
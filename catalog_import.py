@@ -0,0 +1,100 @@
+import csv
+import itertools
+import json
+import os
+import time
+
+#----------------------------------------------------------------------------#
+# Bulk catalog import helpers.
+#----------------------------------------------------------------------------#
+
+def read_rows(path, format=None, report=None):
+    """Yield (line_number, row dict) from a CSV file with a header or an NDJSON file.
+
+    format is 'csv' or 'ndjson'; by default it follows the file extension.
+    NDJSON lines that aren't a JSON object are rejected into report, or raise
+    ValueError without one.
+    """
+    format = format or ('csv' if os.path.splitext(path)[1].lower() == '.csv' else 'ndjson')
+    with open(path, newline='', encoding='utf-8') as file:
+        if format == 'csv':
+            # Line 1 is the header
+            for line_number, row in enumerate(csv.DictReader(file), start=2):
+                yield line_number, row
+        else:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    if not isinstance(row, dict):
+                        raise ValueError(f"expected a JSON object, got {type(row).__name__}")
+                except ValueError as error:
+                    if report is None:
+                        raise ValueError(f"line {line_number}: {error}") from error
+                    report.reject(line_number, {"json": [str(error)]})
+                    continue
+                yield line_number, row
+
+
+def chunked(iterable, size):
+    """Lists of up to size consecutive items from iterable."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def split_list(value, separator=';'):
+    """A list field from NDJSON (already a list) or CSV (separator-joined text)."""
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in str(value).split(separator) if item.strip()]
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 't', 'y', 'yes')
+
+
+def insert_rows(session, table, rows):
+    """Insert rows with one multi-row INSERT statement."""
+    if rows:
+        session.execute(table.insert().values(rows))
+
+
+class ImportReport:
+    """Accepted/rejected counts and throughput of one import run."""
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = []
+        self.started = time.perf_counter()
+
+    def reject(self, line_number, errors):
+        self.rejected.append({"line": line_number, "errors": errors})
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        total = self.accepted + len(self.rejected)
+        return total / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (
+            f"{self.accepted} rows imported, {len(self.rejected)} rejected "
+            f"in {self.elapsed:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+        )
+
+    def write_rejects(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            for rejected in self.rejected:
+                file.write(json.dumps(rejected) + '\n')
@@ -1,5 +1,8 @@
 import os
-SECRET_KEY = os.urandom(32)
+import tempfile
+# Signs sessions; every process must share it once DB_REPLICA_URIS is set, since the session
+# keeps clients on the primary after a write (unset: a random key per process, development only)
+SECRET_KEY = os.environ.get('SECRET_KEY')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -7,7 +10,101 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 DEBUG = True
 
 # Connect to the database
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://jordanhuus@localhost:5432/fyyur')
+SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Connection pool: persistent connections, extra connections allowed under load,
+# seconds to wait for a free connection and seconds before a connection is replaced
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = 30
+DB_POOL_RECYCLE = 1800
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = '<Put your local database url>'
+# Test each connection on checkout, so restarts of the database don't surface as errors
+DB_POOL_PRE_PING = True
+
+# Server-side limit for a single statement in milliseconds (None for no limit, PostgreSQL only)
+DB_STATEMENT_TIMEOUT_MS = 30000
+
+# Read replicas serving GET requests, comma separated in DATABASE_REPLICA_URLS (none by default)
+DB_REPLICA_URIS = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+
+# Skip a replica further behind than this, re-checking each one at most every REPLICA_CHECK_INTERVAL seconds
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_CHECK_INTERVAL = 5
+
+# Keep a client on the primary this many seconds after one of its requests writes
+REPLICA_STICKY_SECONDS = 15
+
+# Most past/upcoming shows listed on a venue or artist page (None for all)
+DETAIL_SHOWS_LIMIT = 100
+
+# Venue/artist search results per page
+SEARCH_RESULTS_PER_PAGE = 20
+
+# 'postgres' searches with pg_trgm indexes, 'memory' with an in-process n-gram index
+SEARCH_BACKEND = 'postgres'
+
+# Seconds before each worker rebuilds its 'memory' search index from the database, which is how
+# it sees other workers' and commands' edits (None never rebuilds, for a single process)
+SEARCH_INDEX_REFRESH_SECONDS = 300
+
+# Venue/artist page cache: 'memory' (per process LRU), 'local' or 'redis' (shared); listing pages
+# only get ETags with 'redis', whose data version every worker and command shares
+CACHE_BACKEND = 'memory'
+CACHE_MAX_ENTRIES = 10000
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 300))
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# Rendered listing pages and template fragments kept by the page cache
+PAGE_CACHE_MAX_ENTRIES = 50000
+
+# /api/v1 list page sizes
+API_DEFAULT_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+# Stream /artists and /shows from a server-side cursor instead of rendering them whole
+STREAM_LISTING_PAGES = False
+STREAM_YIELD_PER = 1000
+
+# Rows per server-side cursor fetch when exporting the catalog
+EXPORT_BATCH_SIZE = 5000
+
+# Locale and timezone of displayed dates (None for the LC_TIME locale and each time's own zone)
+DATETIME_LOCALE = os.environ.get('DATETIME_LOCALE')
+DATETIME_TIMEZONE = os.environ.get('DATETIME_TIMEZONE')
+
+# Log a warning for requests running more statements, spending longer in the database
+# or repeating one statement (differing only by parameters) more often than these (None to skip)
+SQL_WARN_STATEMENTS = 30
+SQL_WARN_DB_MS = 500
+SQL_WARN_REPEATS = 5
+
+# Summarize each request's SQL in X-SQL-* response headers
+SQL_PROFILE_HEADERS = False
+
+# Keep the last SQL_PROFILE_HISTORY request summaries at /debug/sql (development only)
+SQL_PROFILE_ENDPOINT = False
+SQL_PROFILE_HISTORY = 100
+
+# Seconds browsers may cache the fingerprinted files in static/dist (see flask build-assets)
+ASSET_MAX_AGE = 31536000
+
+# Widths /images may resize static images to, how long browsers may cache them and where
+# resized copies are kept (variants built by build-assets are served from static/dist instead)
+IMAGE_WIDTHS = (320, 480, 720, 960, 1440, 1920)
+IMAGE_MAX_AGE = 30 * 24 * 3600
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'fyyur-images'))
+
+# Thumbnails of remote image_link URLs served by /thumbnails: the box each template size is scaled
+# to fit (twice its CSS size, for high-density screens), how long browsers may cache them, the disk
+# cache for originals and thumbnails, and limits on fetching an original
+THUMBNAIL_SIZES = {"tile": (640, 400), "profile": (1110, 1000)}
+THUMBNAIL_MAX_AGE = 7 * 24 * 3600
+THUMBNAIL_CACHE_DIR = os.environ.get('THUMBNAIL_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'fyyur-thumbnails'))
+THUMBNAIL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+THUMBNAIL_FETCH_TIMEOUT = 10
+THUMBNAIL_MAX_SOURCE_BYTES = 20 * 1024 * 1024
+
+# Let image_link hosts resolve to private or loopback addresses (local testing only)
+THUMBNAIL_ALLOW_PRIVATE_HOSTS = False
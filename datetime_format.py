@@ -0,0 +1,68 @@
+import datetime
+import functools
+
+import babel
+import babel.dates
+import dateutil.parser
+
+#----------------------------------------------------------------------------#
+# Date and time formatting.
+#----------------------------------------------------------------------------#
+
+# Named formats accepted by the datetime filter; anything else is a Babel pattern
+NAMED_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_datetime(value):
+    """dateutil.parser.parse(value), cached per string."""
+    return dateutil.parser.parse(value)
+
+
+class DateTimeFormatter:
+    """Babel date formatting with patterns compiled once per (format, locale).
+
+    locale defaults to the process's LC_TIME locale. Times stay in their own
+    zone unless timezone is given; naive times are taken as UTC, as
+    babel.dates does. Formatted strings are memoized per (value, format, locale).
+    """
+
+    def __init__(self, locale=None, timezone=None, cache_size=65536):
+        self.locale = str(babel.Locale.parse(locale or babel.dates.LC_TIME or 'en_US'))
+        self.timezone = babel.dates.get_timezone(timezone) if timezone else None
+        self._compiled = {}
+        self.format = functools.lru_cache(maxsize=cache_size)(self._format)
+
+    def format_many(self, values, format='medium', locale=None):
+        """Format a column of values in one pass, formatting each distinct value once."""
+        formatted = {}
+        for value in values:
+            if value not in formatted:
+                formatted[value] = self.format(value, format, locale)
+        return [formatted[value] for value in values]
+
+    def _format(self, value, format='medium', locale=None):
+        if not isinstance(value, datetime.datetime):
+            value = parse_datetime(value)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=babel.dates.UTC)
+        if self.timezone is not None:
+            value = value.astimezone(self.timezone)
+            if hasattr(self.timezone, 'normalize'):  # pytz
+                value = self.timezone.normalize(value)
+
+        pattern, babel_locale = self._pattern(format, locale or self.locale)
+        return pattern.apply(value, babel_locale)
+
+    def _pattern(self, format, locale):
+        key = (format, locale)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self._compiled[key] = (
+                babel.dates.parse_pattern(NAMED_FORMATS.get(format, format)),
+                babel.Locale.parse(locale)
+            )
+        return compiled
@@ -0,0 +1,157 @@
+import contextlib
+import itertools
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import g, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#----------------------------------------------------------------------------#
+
+# Seconds a PostgreSQL standby is behind; 0 when it has replayed all it received
+# and NULL on a server that is not a standby
+REPLICA_LAG_SQL = '''
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END
+'''
+
+
+class Replica:
+    """One read replica engine and the result of its last health check."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = True
+        self.lag_seconds = None
+        self.checked_at = None
+        self.error = None
+
+    def mark_down(self, error):
+        self.healthy = False
+        self.error = (str(error).strip().splitlines() or [repr(error)])[0]
+        self.checked_at = time.monotonic()
+
+    def as_dict(self):
+        pool = self.engine.pool
+        return {
+            "url": repr(self.engine.url),
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "error": self.error,
+            "pool": pool.stats.as_dict(pool) if hasattr(pool, 'stats') else None
+        }
+
+
+class ReplicaSet:
+    """Read replicas taken in turn, skipping any that are down or lagging.
+
+    Each replica is re-checked at most every check_interval seconds, and is
+    marked down as soon as one of its connections fails. Against a server that
+    is not a standby (e.g. a second local database) the lag reads as 0.
+    """
+
+    def __init__(self, uris, engine_options=None, max_lag_seconds=5, check_interval=5):
+        self.replicas = [Replica(sa.create_engine(uri, **(engine_options or {}))) for uri in uris]
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._cycle = itertools.cycle(self.replicas)
+        self._lock = threading.Lock()
+        for replica in self.replicas:
+            event.listen(replica.engine, 'handle_error', self._error_handler(replica))
+
+    def __len__(self):
+        return len(self.replicas)
+
+    def pick(self):
+        """The engine of the next healthy replica, or None to use the primary."""
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                replica = next(self._cycle)
+                now = time.monotonic()
+                due = replica.checked_at is None or now - replica.checked_at >= self.check_interval
+                if due:
+                    # Claimed before checking, so concurrent requests don't all check
+                    replica.checked_at = now
+            if due:
+                self.check(replica)
+            if replica.healthy:
+                return replica.engine
+        return None
+
+    def check(self, replica):
+        try:
+            with replica.engine.connect() as connection:
+                if connection.dialect.name == 'postgresql':
+                    lag = connection.scalar(REPLICA_LAG_SQL)
+                else:
+                    lag = connection.scalar(sa.select([sa.literal(0)]))
+        except sa.exc.DBAPIError as error:
+            replica.mark_down(error)
+            return
+
+        replica.lag_seconds = float(lag or 0)
+        replica.healthy = replica.lag_seconds <= self.max_lag_seconds
+        replica.error = None if replica.healthy else f"{replica.lag_seconds:.1f}s behind"
+
+    def as_dicts(self):
+        return [replica.as_dict() for replica in self.replicas]
+
+    def _error_handler(self, replica):
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                replica.mark_down(context.original_exception)
+        return handle_error
+
+
+def is_write(clause):
+    """True for statements that must run on the primary."""
+    if clause is None:
+        return False
+    # Raw SQL can't be told apart from reads, so it stays on the primary
+    if isinstance(clause, (UpdateBase, TextClause)):
+        return True
+    return getattr(clause, '_for_update_arg', None) is not None
+
+
+class RoutingSession(SignallingSession):
+    """Session reading from the request's replica (g.db_replica), if any.
+
+    Flushes, INSERT/UPDATE/DELETE and SELECT ... FOR UPDATE always go to the
+    primary and set g.db_wrote, so callers can keep the client on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        if has_request_context():
+            if self._flushing or is_write(clause):
+                g.db_wrote = True
+            elif g.get('db_replica') is not None:
+                return g.db_replica
+        return super().get_bind(mapper, clause)
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """Send reads in this block to the primary, e.g. to fill a cache every client is served from.
+
+    A lagging replica would otherwise put data from before a write back into
+    a cache the write just invalidated, for everyone, for the whole TTL.
+    """
+    replica = g.pop('db_replica', None)
+    try:
+        yield
+    finally:
+        if replica is not None:
+            g.db_replica = replica
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy whose sessions are RoutingSessions."""
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -0,0 +1,372 @@
+import hashlib
+import http.client
+import ipaddress
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import images
+from cache import CacheStats, LRUCache
+
+#----------------------------------------------------------------------------#
+# Image proxy.
+#----------------------------------------------------------------------------#
+
+USER_AGENT = 'Fyyur-ImageProxy/1.0'
+
+
+class FetchError(Exception):
+    """A remote image that couldn't be fetched, or isn't an image."""
+
+
+class ImageNotAllowed(LookupError):
+    """A URL the proxy was asked for but must not fetch."""
+
+
+class DiskCache:
+    """Files under directory, named by a hash of their key, least recently used evicted past max_bytes.
+
+    Recency is each file's atime, set on every hit (the mtime is left alone,
+    as ETags derive from it), so it survives restarts and is shared by every
+    worker using the directory. Eviction runs down to
+    nine tenths of max_bytes, so it doesn't rescan the directory on every put.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def peek(self, key):
+        """Path of key's file, or None, without counting a lookup."""
+        path = self._path(key)
+        return path if os.path.isfile(path) else None
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except FileNotFoundError:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return path
+
+    def read(self, key, lookup=True):
+        """Content stored under key, or None.
+
+        Like get(), but an eviction can't remove the file between finding
+        and reading it. With lookup=False it isn't counted, like peek().
+        """
+        path = self._path(key)
+        content = _read(path)
+        if not lookup:
+            return content
+        if content is None:
+            self.stats.misses += 1
+            return None
+        try:
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except FileNotFoundError:
+            pass
+        self.stats.hits += 1
+        return content
+
+    def put(self, key, content):
+        """Store content under key and return its path."""
+        path = self._path(key)
+        os.makedirs(self.directory, exist_ok=True)
+        images.write_atomically(path, content)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in self._files())
+            else:
+                self._size += len(content)
+            if self._size > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _files(self):
+        """(atime, path, size) of every cached file."""
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+        files = []
+        for entry in entries:
+            if entry.name.endswith('.partial'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_atime, entry.path, stat.st_size))
+        return files
+
+    def _evict(self, keep):
+        files = sorted(self._files())
+        self._size = sum(size for _, _, size in files)
+        target = self.max_bytes * 0.9
+        for _, path, size in files:
+            if self._size <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            self.stats.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for _, path, _ in self._files():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._size = 0
+
+
+def _read(path):
+    """Bytes of the file at path, or None if it isn't there (or was evicted meanwhile)."""
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one call per key at a time; callers arriving meanwhile wait for it and share its outcome.
+
+    Coalesces within a process only; across workers DiskCache's atomic
+    writes make a duplicate fetch harmless.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def check_url(url):
+    """Raise FetchError unless url is an http(s) URL with a host."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise FetchError(f"{url!r} is not an http(s) URL")
+
+
+def resolve(hostname, port, allow_private=False):
+    """Address to connect to for hostname, or FetchError if any of its addresses isn't public."""
+    try:
+        addresses = socket.getaddrinfo(hostname, port, proto=socket.IPPROTO_TCP)
+    except (OSError, ValueError) as error:
+        raise FetchError(f"{hostname}: {error}") from error
+    if not allow_private:
+        for *_, sockaddr in addresses:
+            if not ipaddress.ip_address(sockaddr[0].split('%')[0]).is_global:
+                raise FetchError(f"{hostname} resolves to non-public address {sockaddr[0]}")
+    return addresses[0][4][0]
+
+
+class _PinnedConnection:
+    """http.client connection to an address resolved and checked in advance.
+
+    The socket goes to that address while Host, SNI and certificate checks
+    keep the hostname, so DNS can't answer differently between check and use.
+    """
+
+    def __init__(self, *args, address, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.address = address
+        self._create_connection = self._connect_pinned
+
+    def _connect_pinned(self, target, timeout, source_address=None):
+        return socket.create_connection((self.address, target[1]), timeout, source_address)
+
+
+class _PinnedHTTPConnection(_PinnedConnection, http.client.HTTPConnection):
+    pass
+
+
+class _PinnedHTTPSConnection(_PinnedConnection, http.client.HTTPSConnection):
+    pass
+
+
+def _address(req, default_port, allow_private):
+    parts = urllib.parse.urlsplit(req.full_url)
+    return resolve(parts.hostname, parts.port or default_port, allow_private)
+
+
+class _PinnedHTTPHandler(urllib.request.HTTPHandler):
+
+    def __init__(self, allow_private):
+        super().__init__()
+        self.allow_private = allow_private
+
+    def http_open(self, req):
+        return self.do_open(_PinnedHTTPConnection, req, address=_address(req, 80, self.allow_private))
+
+
+class _PinnedHTTPSHandler(urllib.request.HTTPSHandler):
+
+    def __init__(self, allow_private):
+        super().__init__()
+        self.allow_private = allow_private
+
+    def https_open(self, req):
+        return self.do_open(_PinnedHTTPSConnection, req, address=_address(req, 443, self.allow_private))
+
+
+class _CheckedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Follows redirects only to http(s) URLs; their hosts are checked on connecting."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def fetch(url, timeout=10, max_bytes=20 * 1024 * 1024, allow_private=False):
+    """Body of the image at url, or FetchError.
+
+    Every host, redirects' included, is resolved once and must have only
+    public addresses unless allow_private. Proxy settings from the
+    environment are ignored, since the connection goes to the checked address.
+    """
+    check_url(url)
+    opener = urllib.request.build_opener(
+        urllib.request.ProxyHandler({}),
+        _PinnedHTTPHandler(allow_private),
+        _PinnedHTTPSHandler(allow_private),
+        _CheckedRedirectHandler()
+    )
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT, 'Accept': 'image/*'})
+    try:
+        with opener.open(request, timeout=timeout) as response:
+            content_type = response.headers.get_content_type()
+            if not content_type.startswith('image/'):
+                raise FetchError(f"{url} is {content_type}, not an image")
+            content = response.read(max_bytes + 1)
+    except (urllib.error.URLError, http.client.HTTPException, OSError) as error:
+        raise FetchError(f"{url}: {error}") from error
+    if len(content) > max_bytes:
+        raise FetchError(f"{url} is larger than {max_bytes:,} bytes")
+    return content
+
+
+class ImageProxy:
+    """Thumbnails of remote images, each original fetched once and kept with its thumbnails in a DiskCache.
+
+    Concurrent requests for one original or thumbnail share a single fetch
+    and resize. Failed and disallowed URLs are remembered for failure_ttl
+    seconds, so a dead host isn't asked again on every page view.
+    """
+
+    def __init__(self, directory, max_bytes, timeout=10, max_source_bytes=20 * 1024 * 1024,
+                 allow_private=False, failure_ttl=60):
+        self.cache = DiskCache(directory, max_bytes)
+        self.stats = self.cache.stats
+        self.timeout = timeout
+        self.max_source_bytes = max_source_bytes
+        self.allow_private = allow_private
+        self._flights = SingleFlight()
+        self._failures = LRUCache(max_entries=10000, default_ttl=failure_ttl)
+
+    def original(self, url, allowed):
+        """Bytes of url's image, fetched on first use if allowed(url)."""
+        key = f"original:{url}"
+        content = self.cache.read(key)
+        if content is not None:
+            return content
+
+        def load():
+            # Stored by a call that finished after the lookup above
+            content = self.cache.read(key, lookup=False)
+            if content is not None:
+                return content
+            failure = self._failures.get(url)
+            if failure is not None:
+                raise type(failure)(*failure.args)
+            if not allowed(url):
+                self._failures.set(url, ImageNotAllowed(url))
+                raise ImageNotAllowed(url)
+            try:
+                content = fetch(url, self.timeout, self.max_source_bytes, self.allow_private)
+                images.image_size(content)
+            except FetchError as error:
+                self._failures.set(url, error)
+                raise
+            except Exception as error:
+                # Pillow can't read it, whatever the Content-Type said
+                failure = FetchError(f"{url} is not a readable image: {error}")
+                self._failures.set(url, failure)
+                raise failure from error
+            self.cache.put(key, content)
+            return content
+
+        return self._flights.do(key, load)
+
+    def thumbnail(self, url, box, format, allowed):
+        """Path of url's image scaled to fit box (width, height) as format, resized on first use."""
+        key = f"thumbnail:{box[0]}x{box[1]}:{format}:{url}"
+        path = self.cache.get(key)
+        if path is not None:
+            return path
+
+        def render():
+            path = self.cache.peek(key)
+            if path is not None:
+                return path
+            source = self.original(url, allowed)
+            return self.cache.put(key, images.resize(source, box[0], format, height=box[1]))
+
+        return self._flights.do(key, render)
+
+    def as_dict(self):
+        return dict(self.stats.as_dict(), coalesced=self._flights.coalesced)
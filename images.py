@@ -0,0 +1,164 @@
+import functools
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import threading
+
+from werkzeug.security import safe_join
+
+from assets import DIST_DIR, fingerprinted
+
+#----------------------------------------------------------------------------#
+# Responsive images.
+#----------------------------------------------------------------------------#
+
+# Source images built by build-assets, relative to the static folder, and their widths
+IMAGES = {
+    'img/front-splash.jpg': (480, 720, 960, 1440)
+}
+
+# Output formats, smallest first; those the installed Pillow can't write are skipped
+FORMATS = ('avif', 'webp', 'jpeg')
+QUALITY = {"avif": 50, "webp": 75, "jpeg": 80}
+EXTENSIONS = {"avif": 'avif', "webp": 'webp', "jpeg": 'jpg'}
+MIME_TYPES = {"avif": 'image/avif', "webp": 'image/webp', "jpeg": 'image/jpeg'}
+
+# Variants and their manifest, relative to the static folder
+IMAGE_DIR = f"{DIST_DIR}/img"
+MANIFEST = os.path.join(DIST_DIR, 'images.json')
+
+# Older Pythons don't know these types
+for _format in ('avif', 'webp'):
+    mimetypes.add_type(MIME_TYPES[_format], '.' + EXTENSIONS[_format])
+
+
+@functools.lru_cache(maxsize=None)
+def available_formats():
+    """FORMATS Pillow can write here, () if Pillow isn't installed."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return ()
+    Image.init()
+    return tuple(format for format in FORMATS if format.upper() in Image.SAVE)
+
+
+def image_size(source):
+    """(width, height) of image bytes, read from the header only."""
+    from PIL import Image
+    with Image.open(io.BytesIO(source)) as image:
+        return image.size
+
+
+def variant_widths(source_width, widths):
+    """widths, never wider than the source."""
+    return sorted({min(width, source_width) for width in widths})
+
+
+def resize(source, width, format, height=None):
+    """Image bytes scaled down (never up) to width, or to fit width x height, encoded as format."""
+    from PIL import Image, ImageOps
+    with Image.open(io.BytesIO(source)) as original:
+        image = ImageOps.exif_transpose(original)
+        scale = min(width / image.width, height / image.height if height else 1)
+        if scale < 1:
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(size, Image.LANCZOS)
+        if format == 'jpeg' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA' if 'A' in image.mode or image.mode == 'P' else 'RGB')
+        options = {"quality": QUALITY[format]}
+        if format == 'jpeg':
+            options.update(optimize=True, progressive=True)
+        output = io.BytesIO()
+        image.save(output, format.upper(), **options)
+        return output.getvalue()
+
+
+def _read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def write_atomically(path, content):
+    """Write content to path through a .partial file renamed into place, so readers never see half a file."""
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.partial"
+    with open(partial, 'wb') as file:
+        file.write(content)
+    os.replace(partial, path)
+
+
+def build(static_folder):
+    """Write every IMAGES variant to IMAGE_DIR and return the new manifest, {} without Pillow.
+
+    {name: {"width", "height", "sources": {format: [[path, width], ...]}}}
+    """
+    formats = available_formats()
+    if not formats:
+        return {}
+    dist = os.path.join(static_folder, IMAGE_DIR)
+    os.makedirs(dist, exist_ok=True)
+
+    manifest = {}
+    for name, widths in IMAGES.items():
+        source = _read(os.path.join(static_folder, name))
+        width, height = image_size(source)
+        stem = os.path.splitext(os.path.basename(name))[0]
+        sources = {}
+        for format in formats:
+            sources[format] = []
+            for variant_width in variant_widths(width, widths):
+                content = resize(source, variant_width, format)
+                filename = fingerprinted(f"{stem}-{variant_width}w.{EXTENSIONS[format]}", content)
+                with open(os.path.join(dist, filename), 'wb') as file:
+                    file.write(content)
+                sources[format].append([f"{IMAGE_DIR}/{filename}", variant_width])
+        manifest[name] = {"width": width, "height": height, "sources": sources}
+
+    with open(os.path.join(static_folder, MANIFEST), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """The manifest of the last build, or {} if images were never built."""
+    try:
+        with open(os.path.join(static_folder, MANIFEST), encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def source_path(static_folder, name):
+    """Path of static image name, or None if there's no such file."""
+    path = safe_join(static_folder, name)
+    if path is None or not os.path.isfile(path) or mimetypes.guess_type(path)[0] not in MIME_TYPES.values():
+        return None
+    return path
+
+
+@functools.lru_cache(maxsize=256)
+def _size_of(path, modified):
+    return image_size(_read(path))
+
+
+def source_size(path):
+    """(width, height) of the image at path, remembered until the file changes."""
+    return _size_of(path, os.stat(path).st_mtime_ns)
+
+
+def cached_variant(path, cache_dir, width, format):
+    """Path of the image at path resized to width as format, transformed on first use and kept in cache_dir."""
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}:{width}:{format}:{QUALITY[format]}"
+    cached = os.path.join(cache_dir, f"{hashlib.sha256(key.encode()).hexdigest()}.{EXTENSIONS[format]}")
+    if os.path.isfile(cached):
+        return cached
+
+    content = resize(_read(path), width, format)
+    os.makedirs(cache_dir, exist_ok=True)
+    write_atomically(cached, content)
+    return cached
@@ -0,0 +1,193 @@
+import bisect
+import math
+import threading
+import types
+import weakref
+
+#----------------------------------------------------------------------------#
+# Prometheus metrics.
+#----------------------------------------------------------------------------#
+
+# Request-scale latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _thread_local():
+    """threading.local(), or one shared namespace under gevent.
+
+    Greenlets share their thread and only switch at I/O, so they can share a
+    shard safely; one shard per greenlet would grow with every request.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return threading.local()
+    if monkey.is_module_patched('threading'):
+        return types.SimpleNamespace()
+    return threading.local()
+
+
+def _add(into, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            total = into.setdefault(key, [0] * len(value))
+            for position, part in enumerate(value):
+                total[position] += part
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+class _Shard:
+    __slots__ = ('values', '__weakref__')
+
+    def __init__(self):
+        self.values = {}
+
+
+class _ShardedValues:
+    """Per-thread dicts that only their own thread writes, summed when read.
+
+    Writers never take a lock. When a thread ends its values fold into a
+    retired total, so thread-per-request servers don't accumulate shards.
+    """
+
+    def __init__(self):
+        self._local = _thread_local()
+        self._shards = weakref.WeakSet()
+        self._retired = {}
+        self._lock = threading.RLock()
+
+    def values(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.add(shard)
+            weakref.finalize(shard, self._retire, shard.values)
+        return shard.values
+
+    def collect(self):
+        with self._lock:
+            total = {}
+            _add(total, self._retired)
+            for shard in list(self._shards):
+                _add(total, shard.values.copy())
+            return total
+
+    def _retire(self, values):
+        with self._lock:
+            _add(self._retired, values)
+
+
+class Counter:
+    """Monotonic count per label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = _ShardedValues()
+
+    def inc(self, *label_values, amount=1):
+        values = self._values.values()
+        values[label_values] = values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in sorted(self._values.collect().items()):
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Gauge(Counter):
+    """Value per label values that can go up and down."""
+
+    kind = 'gauge'
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    """Bucketed observations per label values."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values = _ShardedValues()
+
+    def observe(self, value, *label_values):
+        values = self._values.values()
+        # One count per bucket plus +Inf, then the sum; made cumulative when scraped
+        counts = values.get(label_values)
+        if counts is None:
+            counts = values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        for label_values, counts in sorted(self._values.collect().items()):
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield self.name + '_bucket', dict(labels, le=_format_value(bound)), cumulative
+            yield self.name + '_count', labels, cumulative
+            yield self.name + '_sum', labels, counts[-1]
+
+
+class Callback:
+    """Metric read from collect() -> {label values: value} when scraped."""
+
+    def __init__(self, name, help, kind, labels, collect):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self.collect = collect
+
+    def samples(self):
+        for label_values, value in sorted(self.collect().items()):
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Registry:
+    """Metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = (
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(float(value)) if isinstance(value, float) else str(value)
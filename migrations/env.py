@@ -47,7 +47,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=target_metadata, literal_binds=True
+        url=url, target_metadata=target_metadata, literal_binds=True,
+        transaction_per_migration=True
     )
 
     with context.begin_transaction():
@@ -83,6 +84,8 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            # Revisions that commit part-way (autocommit_block) mustn't commit earlier ones with them
+            transaction_per_migration=True,
             **current_app.extensions['migrate'].configure_args
         )
 
@@ -0,0 +1,49 @@
+"""Denormalized upcoming show counters on Venue and Artist
+
+Revision ID: 27fce4935c30
+Revises: a7e88026e884
+Create Date: 2026-10-18 11:20:53.117604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '27fce4935c30'
+down_revision = 'a7e88026e884'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('num_upcoming_shows', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Artist', sa.Column('num_upcoming_shows', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('UpcomingSweep',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('swept_until', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Count from now on, matching what rebuild_upcoming_counts() does
+    op.execute('INSERT INTO "UpcomingSweep" (id, swept_until) VALUES (1, now())')
+    op.execute('''
+        UPDATE "Venue" SET num_upcoming_shows = (
+            SELECT count(*) FROM "Show"
+            WHERE "Show".venue_id = "Venue".id
+            AND "Show".start_time >= (SELECT swept_until FROM "UpcomingSweep")
+        )
+    ''')
+    op.execute('''
+        UPDATE "Artist" SET num_upcoming_shows = (
+            SELECT count(*) FROM "Show"
+            WHERE "Show".artist_id = "Artist".id
+            AND "Show".start_time >= (SELECT swept_until FROM "UpcomingSweep")
+        )
+    ''')
+
+
+def downgrade():
+    op.drop_table('UpcomingSweep')
+    op.drop_column('Artist', 'num_upcoming_shows')
+    op.drop_column('Venue', 'num_upcoming_shows')
@@ -0,0 +1,80 @@
+"""Show.start_time as timestamptz with venue/artist range indexes
+
+Revision ID: 90f7bc5ac939
+Revises: a1ba3e2a0e9d
+Create Date: 2026-10-18 09:12:41.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '90f7bc5ac939'
+down_revision = 'a1ba3e2a0e9d'
+branch_labels = None
+depends_on = None
+
+# Rows converted per UPDATE statement, each committed on its own
+BATCH_SIZE = 10000
+
+
+def _copy_in_batches(expression):
+    """Fill "Show".start_time_new from expression, BATCH_SIZE ids at a time.
+
+    The batches run outside the migration's transaction, each committed as
+    it finishes, so row locks are only held for one batch. The new column is
+    committed first; if a batch fails, running the migration again reuses it
+    and skips the rows already copied.
+    """
+    connection = op.get_bind()
+    max_id = connection.execute(sa.text('SELECT max(id) FROM "Show"')).scalar()
+    if max_id is None:
+        return
+
+    update = sa.text(
+        f'UPDATE "Show" SET start_time_new = {expression} '
+        'WHERE id >= :low AND id < :high AND start_time_new IS NULL'
+    )
+    with op.get_context().autocommit_block():
+        for low in range(0, max_id + 1, BATCH_SIZE):
+            connection.execute(update, low=low, high=low + BATCH_SIZE)
+
+
+def _copy_stragglers(expression):
+    """Lock "Show" for the rest of the migration and copy rows written during the batches."""
+    op.execute('LOCK TABLE "Show" IN ACCESS EXCLUSIVE MODE')
+    op.execute(f'UPDATE "Show" SET start_time_new = {expression} WHERE start_time_new IS NULL')
+
+
+def _add_start_time_new(column_type):
+    """Add "Show".start_time_new, unless a failed run of this migration left it behind."""
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('Show')}
+    if 'start_time_new' not in columns:
+        op.add_column('Show', sa.Column('start_time_new', column_type, nullable=True))
+
+
+def upgrade():
+    _add_start_time_new(sa.DateTime(timezone=True))
+
+    # Stored strings look like 2020-02-19T21:30:00.00Z, which Postgres casts directly
+    _copy_in_batches('start_time::timestamptz')
+    _copy_stragglers('start_time::timestamptz')
+
+    op.drop_column('Show', 'start_time')
+    op.alter_column('Show', 'start_time_new', new_column_name='start_time', nullable=False)
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    _add_start_time_new(sa.String())
+
+    to_text = "to_char(start_time AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS.US\"Z\"')"
+    _copy_in_batches(to_text)
+    _copy_stragglers(to_text)
+
+    op.drop_column('Show', 'start_time')
+    op.alter_column('Show', 'start_time_new', new_column_name='start_time', nullable=False)
@@ -0,0 +1,30 @@
+"""Trigram GIN indexes for venue and artist search
+
+Revision ID: a7e88026e884
+Revises: 90f7bc5ac939
+Create Date: 2026-10-18 10:02:17.884120
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e88026e884'
+down_revision = '90f7bc5ac939'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Venue_city_trgm', 'Venue', ['city'], unique=False, postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'})
+    op.create_index('ix_Venue_state_trgm', 'Venue', ['state'], unique=False, postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'})
+    op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_state_trgm', table_name='Venue')
+    op.drop_index('ix_Venue_city_trgm', table_name='Venue')
+    op.drop_index('ix_Venue_name_trgm', table_name='Venue')
@@ -0,0 +1,25 @@
+"""Indexes on Venue and Artist image_link for the thumbnail proxy
+
+Revision ID: e15826cea615
+Revises: 27fce4935c30
+Create Date: 2026-10-18 19:40:12.318254
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e15826cea615'
+down_revision = '27fce4935c30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Venue_image_link', 'Venue', ['image_link'], unique=False)
+    op.create_index('ix_Artist_image_link', 'Artist', ['image_link'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_image_link', table_name='Artist')
+    op.drop_index('ix_Venue_image_link', table_name='Venue')
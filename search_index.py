@@ -0,0 +1,160 @@
+from array import array
+from bisect import bisect_left
+import heapq
+import threading
+
+#----------------------------------------------------------------------------#
+# In-process n-gram search index.
+#----------------------------------------------------------------------------#
+
+# Field boundary markers, so terms shorter than n still fall inside some gram
+_START = '\x02'
+_END = '\x03'
+_FIELD_SEPARATOR = '\x00'
+
+
+def ngrams(text, n=3):
+    """Set of lowercase n-grams of text, padded with boundary markers."""
+    padded = _START + text.lower() + _END
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+def similarity(a, b, n=3):
+    """Share of n-grams a and b have in common, like pg_trgm's similarity()."""
+    a_grams = ngrams(a, n)
+    b_grams = ngrams(b, n)
+    return len(a_grams & b_grams) / len(a_grams | b_grams)
+
+
+class NgramIndex:
+    """Inverted n-gram index answering case-insensitive substring queries.
+
+    Each gram maps to a sorted array('I') of document ids, four bytes per
+    posting, and each document keeps one lowercase string of its fields.
+    Queries intersect the posting lists of the term's grams, confirm the
+    substring match, and rank like search_catalog(): best field similarity,
+    then first field, then id. Each field's gram count is kept at index time,
+    so ranking a match only checks the term's few grams against its fields.
+
+    Updates only reach the process that makes them; the app rebuilds each
+    worker's index every SEARCH_INDEX_REFRESH_SECONDS to pick up the others'.
+    """
+
+    def __init__(self, n=3):
+        self.n = n
+        self._postings = {}
+        self._documents = {}
+        self._gram_counts = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._documents
+
+    def add(self, doc_id, fields):
+        """Index doc_id under fields, replacing any earlier entry."""
+        with self._lock:
+            if doc_id in self._documents:
+                self.remove(doc_id)
+
+            field_grams = [ngrams(field or '', self.n) for field in fields]
+            self._documents[doc_id] = _FIELD_SEPARATOR.join(field or '' for field in fields).lower()
+            self._gram_counts[doc_id] = tuple(len(grams) for grams in field_grams)
+            for gram in set().union(*field_grams):
+                postings = self._postings.get(gram)
+                if postings is None:
+                    self._postings[gram] = array('I', (doc_id,))
+                elif postings[-1] < doc_id:
+                    # Ids mostly arrive in ascending order, so appending is the common case
+                    postings.append(doc_id)
+                else:
+                    postings.insert(bisect_left(postings, doc_id), doc_id)
+
+    def remove(self, doc_id):
+        """Drop doc_id from the index; unknown ids are ignored."""
+        with self._lock:
+            document = self._documents.pop(doc_id, None)
+            if document is None:
+                return
+            del self._gram_counts[doc_id]
+
+            for gram in self._grams(document.split(_FIELD_SEPARATOR)):
+                postings = self._postings[gram]
+                del postings[bisect_left(postings, doc_id)]
+                if not postings:
+                    del self._postings[gram]
+
+    def search(self, term, limit=None, offset=0):
+        """Ranked ids of documents with a field containing term.
+
+        Returns (total_matches, ids) where ids is the limit/offset page.
+        """
+        term = term.lower()
+        term_grams = ngrams(term, self.n)
+        with self._lock:
+            if term:
+                candidates = self._candidates(term)
+            else:
+                candidates = self._documents.keys()
+
+            matches = []
+            for doc_id in candidates:
+                document = self._documents[doc_id]
+                # The separator can't be in term, so this is "some field contains term"
+                if term in document:
+                    fields = document.split(_FIELD_SEPARATOR)
+                    matches.append((-self._rank(term_grams, fields, self._gram_counts[doc_id]), fields[0], doc_id))
+
+        if limit is None:
+            page = sorted(matches)[offset:]
+        else:
+            page = heapq.nsmallest(offset + limit, matches)[offset:]
+        return len(matches), [doc_id for _, _, doc_id in page]
+
+    def _rank(self, term_grams, fields, gram_counts):
+        """Best similarity(field, term) over fields, from the term's grams and each field's gram count.
+
+        A gram of n characters is one of a field's grams exactly when it
+        appears in the padded field, so the field's own gram set isn't needed.
+        """
+        best = 0.0
+        for field, gram_count in zip(fields, gram_counts):
+            padded = _START + field + _END
+            if len(padded) < self.n:
+                shared = int(padded in term_grams)
+            else:
+                shared = len([gram for gram in term_grams if len(gram) == self.n and gram in padded])
+            best = max(best, shared / (gram_count + len(term_grams) - shared))
+        return best
+
+    def _grams(self, fields):
+        grams = set()
+        for field in fields:
+            grams |= ngrams(field or '', self.n)
+        return grams
+
+    def _candidates(self, term):
+        if len(term) >= self.n:
+            # Every gram inside the term must appear in a matching field
+            grams = {term[i:i + self.n] for i in range(len(term) - self.n + 1)}
+            postings = sorted((self._postings.get(gram, ()) for gram in grams), key=len)
+        else:
+            # Short terms sit inside grams rather than spanning them
+            postings = [self._union(postings for gram, postings in self._postings.items() if term in gram)]
+
+        smallest, others = postings[0], postings[1:]
+        return [doc_id for doc_id in smallest if all(_contains(other, doc_id) for other in others)]
+
+    @staticmethod
+    def _union(posting_lists):
+        ids = set()
+        for postings in posting_lists:
+            ids.update(postings)
+        return sorted(ids)
+
+
+def _contains(postings, doc_id):
+    position = bisect_left(postings, doc_id)
+    return position < len(postings) and postings[position] == doc_id
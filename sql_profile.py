@@ -0,0 +1,110 @@
+import functools
+import re
+import time
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Per-request SQL profiling.
+#----------------------------------------------------------------------------#
+
+# Longest statement text kept in a summary
+STATEMENT_PREVIEW_CHARS = 300
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+# pyformat and format placeholders, as psycopg2 statements have them
+_PLACEHOLDER = re.compile(r'%\([^)]+\)s|%s')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize(statement):
+    """statement with literals, placeholders and IN lists folded to ?, so repeats differing only by parameter match."""
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _PLACEHOLDER.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    statement = _PLACEHOLDER_LIST.sub('(?)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+class RequestProfile:
+    """Statements one request ran, grouped by normalized text."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # normalized statement -> [count, total seconds, slowest seconds]
+        self.statements = {}
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def slowest(self, limit=5):
+        ranked = sorted(self.statements.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+        return [
+            {"statement": statement[:STATEMENT_PREVIEW_CHARS], "ms": slowest * 1000}
+            for statement, (_, _, slowest) in ranked
+        ]
+
+    def repeated(self, threshold):
+        """Statements run at least threshold times, the signature of an N+1 loop."""
+        ranked = sorted(self.statements.items(), key=lambda item: item[1][0], reverse=True)
+        return [
+            {"statement": statement[:STATEMENT_PREVIEW_CHARS], "count": count, "ms": total * 1000}
+            for statement, (count, total, _) in ranked if count >= threshold
+        ]
+
+    def summary(self, repeat_threshold=2):
+        return {
+            "statements": self.count,
+            "db_ms": self.seconds * 1000,
+            "slowest": self.slowest(),
+            "repeated": self.repeated(repeat_threshold)
+        }
+
+
+def current_profile():
+    """The RequestProfile of the current request, or None outside one."""
+    if not has_request_context():
+        return None
+    profile = g.get('sql_profile')
+    if profile is None:
+        profile = g.sql_profile = RequestProfile()
+    return profile
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('sql_profile_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['sql_profile_started'].pop()
+    profile = current_profile()
+    if profile is not None:
+        profile.record(normalize(statement), time.perf_counter() - started)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get('sql_profile_started'):
+        context.connection.info['sql_profile_started'].pop()
+
+
+def install():
+    """Profile statements of every engine in the process. Safe to call more than once."""
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
@@ -0,0 +1,2 @@
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'postgres: needs PostgreSQL, from FYYUR_BUDGETS_DATABASE_URL or testing.postgresql')
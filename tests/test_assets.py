@@ -0,0 +1,83 @@
+"""assets build, manifest and precompressed file selection, on a copy of static/.
+
+    $ python -m pytest tests
+"""
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import assets
+
+STATIC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+
+
+class BuildTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.static = os.path.join(self.directory, 'static')
+        shutil.copytree(STATIC, self.static, ignore=shutil.ignore_patterns(assets.DIST_DIR))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_writes_fingerprinted_outputs_and_their_manifest(self):
+        self.assertEqual(assets.load_manifest(self.static), {})
+        manifest = assets.build(self.static)
+
+        self.assertEqual(set(manifest), set(assets.BUNDLES) | set(assets.FILES))
+        self.assertEqual(assets.load_manifest(self.static), manifest)
+        css = manifest['main.css']
+        with open(os.path.join(self.static, css), 'rb') as file:
+            content = file.read()
+        self.assertEqual(css, f"{assets.DIST_DIR}/{assets.fingerprinted('main.css', content)}")
+        with open(os.path.join(self.static, css + '.gz'), 'rb') as file:
+            self.assertEqual(gzip.decompress(file.read()), content)
+
+    def test_rebuilding_unchanged_sources_gives_the_same_names(self):
+        self.assertEqual(assets.build(self.static), assets.build(self.static))
+
+    def test_asset_paths_before_and_after_a_build(self):
+        self.assertEqual(assets.asset_paths({}, 'body.js'), list(assets.BUNDLES['body.js']))
+        self.assertEqual(assets.asset_paths({}, 'js/libs/jquery-1.11.1.min.js'), ['js/libs/jquery-1.11.1.min.js'])
+        manifest = assets.build(self.static)
+        self.assertEqual(assets.asset_paths(manifest, 'body.js'), [manifest['body.js']])
+
+
+class MinifyTest(unittest.TestCase):
+
+    def test_css_keeps_license_comments(self):
+        minified = assets.minify_css('/*! MIT */\n/* layout */\nbody  {\n  color : red ;\n}\n')
+        self.assertIn('/*! MIT */', minified)
+        self.assertNotIn('layout', minified)
+        self.assertIn('body{color', minified.replace(' ', '').replace('\n', ''))
+
+    def test_fingerprint_follows_content(self):
+        self.assertRegex(assets.fingerprinted('css/main.css', b'a'), r'^main\.[0-9a-f]{12}\.css$')
+        self.assertNotEqual(assets.fingerprinted('main.css', b'a'), assets.fingerprinted('main.css', b'b'))
+
+
+class PrecompressedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ('main.css', 'main.css.gz', 'main.css.br', 'plain.js', 'plain.js.gz'):
+            open(os.path.join(self.directory, name), 'wb').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_prefers_brotli_then_gzip(self):
+        self.assertEqual(assets.precompressed(self.directory, 'main.css', 'gzip, deflate, br'), ('main.css.br', 'br'))
+        self.assertEqual(assets.precompressed(self.directory, 'plain.js', 'gzip, br'), ('plain.js.gz', 'gzip'))
+
+    def test_honours_refused_encodings(self):
+        self.assertEqual(assets.precompressed(self.directory, 'main.css', 'br;q=0, gzip'), ('main.css.gz', 'gzip'))
+        self.assertEqual(assets.precompressed(self.directory, 'main.css', 'br;q=0.0, gzip;q=0'), ('main.css', None))
+        self.assertEqual(assets.precompressed(self.directory, 'main.css', ''), ('main.css', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
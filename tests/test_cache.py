@@ -0,0 +1,127 @@
+"""cache backends, with a controllable clock in place of time.monotonic.
+
+    $ python -m pytest tests
+"""
+import unittest
+from unittest import mock
+
+import cache
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ClockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('cache.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class LRUCacheTest(ClockTestCase):
+
+    def test_evicts_least_recently_used(self):
+        lru = cache.LRUCache(max_entries=3)
+        for key in 'abc':
+            lru.set(key, key.upper())
+        lru.get('a')
+        lru.set('d', 'D')
+
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual([lru.get(key) for key in 'acd'], ['A', 'C', 'D'])
+        self.assertEqual(len(lru), 3)
+        self.assertEqual(lru.stats.evictions, 1)
+
+    def test_entries_expire_after_their_ttl(self):
+        lru = cache.LRUCache(default_ttl=10)
+        lru.set('default', 1)
+        lru.set('short', 2, ttl=1)
+        self.clock.now += 5
+        self.assertIsNone(lru.get('short'))
+        self.assertEqual(lru.get('default'), 1)
+        self.clock.now += 5
+        self.assertIsNone(lru.get('default'))
+        self.assertEqual(len(lru), 0)
+
+    def test_zero_ttl_is_never_served(self):
+        lru = cache.LRUCache()
+        lru.set('key', 'value', ttl=0)
+        self.assertIsNone(lru.get('key'))
+
+    def test_counts_lookups(self):
+        lru = cache.LRUCache()
+        lru.set('key', 'value')
+        lru.get('key')
+        lru.get('other')
+        lru.delete('key')
+        lru.get('key')
+        self.assertEqual(lru.stats.as_dict(), {"hits": 1, "misses": 2, "evictions": 0, "hit_rate": 1 / 3})
+
+
+class SharedCacheTest(ClockTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = cache.LocalClient()
+        self.shared = cache.SharedCache(self.client, default_ttl=10)
+
+    def test_round_trips_values_under_tuple_keys(self):
+        self.shared.set(('venue', 1), {'name': 'The Owl'})
+        self.assertEqual(self.shared.get(('venue', 1)), {'name': 'The Owl'})
+        self.assertIsNotNone(self.client.get('fyyur:venue:1'))
+
+        # Another worker's cache over the same store sees the value and its deletion
+        other = cache.SharedCache(self.client)
+        self.assertEqual(other.get(('venue', 1)), {'name': 'The Owl'})
+        other.delete(('venue', 1))
+        self.assertIsNone(self.shared.get(('venue', 1)))
+
+    def test_entries_expire_after_their_ttl(self):
+        self.shared.set(('key',), 'value')
+        self.clock.now += 10
+        self.assertIsNone(self.shared.get(('key',)))
+
+    def test_zero_ttl_is_not_stored(self):
+        self.shared.set(('key',), 'value', ttl=0)
+        self.assertIsNone(self.client.get('fyyur:key'))
+
+
+class VersionTokenTest(unittest.TestCase):
+
+    def test_bump_replaces_the_token(self):
+        token = cache.VersionToken()
+        first = token.get()
+        self.assertEqual(token.get(), first)
+        self.assertNotEqual(token.bump(), first)
+        self.assertFalse(token.shared)
+
+    def test_shared_token_reaches_every_process(self):
+        client = cache.LocalClient()
+        worker, command = cache.VersionToken(client), cache.VersionToken(client)
+        before = worker.get()
+        command.bump()
+        self.assertNotEqual(worker.get(), before)
+        self.assertEqual(worker.get(), command.get())
+        self.assertTrue(worker.shared)
+
+
+class MakeCacheTest(unittest.TestCase):
+
+    def test_selects_the_backend(self):
+        self.assertIsInstance(cache.make_cache({}), cache.LRUCache)
+        self.assertEqual(cache.make_cache({'CACHE_MAX_ENTRIES': 5}, max_entries=2).max_entries, 2)
+        self.assertIsInstance(cache.make_cache({'CACHE_BACKEND': 'local'}), cache.SharedCache)
+        with self.assertRaises(ValueError):
+            cache.make_cache({'CACHE_BACKEND': 'memcached'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""catalog_export writers, read back with catalog_import and pyarrow.
+
+    $ python -m pytest tests
+"""
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import ARRAY, Boolean, Column, DateTime, Integer, MetaData, String, Table
+
+import catalog_export
+from catalog_import import read_rows, split_list
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+show = Table(
+    'Show', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('genres', ARRAY(String)),
+    Column('seeking', Boolean),
+    Column('start_time', DateTime(timezone=True))
+)
+
+COLUMNS = [column.name for column in show.columns]
+STARTED = datetime.datetime(2026, 5, 1, 20, 30, tzinfo=datetime.timezone.utc)
+BATCHES = [
+    [(1, ['Jazz', 'Blues'], True, STARTED)],
+    [],
+    [(2, None, None, None), (3, [], False, STARTED)]
+]
+
+
+class TextChunksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, chunks):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            file.writelines(chunks)
+        return path
+
+    def test_ndjson_has_one_object_per_row(self):
+        chunks = list(catalog_export.text_chunks('ndjson', COLUMNS, BATCHES))
+        self.assertEqual(len(chunks), len(BATCHES))
+        rows = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        self.assertEqual(rows[0], {"id": 1, "genres": ["Jazz", "Blues"], "seeking": True, "start_time": "2026-05-01T20:30:00+00:00"})
+        self.assertEqual([row["id"] for row in rows], [1, 2, 3])
+
+    def test_csv_reads_back_with_the_importer(self):
+        path = self.write('shows.csv', catalog_export.text_chunks('csv', COLUMNS, BATCHES))
+        rows = [row for _, row in read_rows(path)]
+        self.assertEqual([row["id"] for row in rows], ['1', '2', '3'])
+        self.assertEqual([split_list(row["genres"]) for row in rows], [['Jazz', 'Blues'], [], []])
+        self.assertEqual(rows[0]["start_time"], '2026-05-01T20:30:00+00:00')
+        self.assertEqual(rows[1]["seeking"], '')
+
+    def test_csv_without_rows_is_just_the_header(self):
+        self.assertEqual(''.join(catalog_export.text_chunks('csv', COLUMNS, [])), 'id,genres,seeking,start_time\r\n')
+
+    def test_parquet_is_not_a_text_format(self):
+        with self.assertRaises(ValueError):
+            catalog_export.text_chunks('parquet', COLUMNS, BATCHES)
+
+
+@unittest.skipUnless(pyarrow is not None, 'needs pyarrow')
+class ParquetTest(unittest.TestCase):
+
+    def test_keeps_column_types_through_all_null_batches(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'shows.parquet')
+        catalog_export.write_parquet(path, show.columns, [[(2, None, None, None)], BATCHES[0]])
+
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.schema, catalog_export.parquet_schema(show.columns))
+        self.assertEqual(table.schema.field('genres').type.value_type, pyarrow.string())
+        self.assertEqual(table.schema.field('start_time').type, pyarrow.timestamp('us', tz='UTC'))
+        self.assertFalse(table.schema.field('id').nullable)
+        self.assertEqual(table.column('genres').to_pylist(), [None, ['Jazz', 'Blues']])
+        self.assertEqual(table.column('start_time').to_pylist()[1], STARTED)
+        self.assertEqual(pyarrow.parquet.ParquetFile(path).num_row_groups, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
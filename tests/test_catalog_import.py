@@ -0,0 +1,98 @@
+"""catalog_import file readers and helpers, on temporary files.
+
+    $ python -m pytest tests
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from catalog_import import ImportReport, chunked, parse_bool, read_rows, split_list
+
+
+class ReadRowsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+    def test_rejects_bad_ndjson_lines_into_the_report(self):
+        path = self.write('venues.ndjson', '\n'.join([
+            '{"name": "The Owl"}',
+            '',
+            '{"name": ',
+            '["not", "an", "object"]',
+            '{"name": "Café Ü", "genres": ["Jazz"]}'
+        ]) + '\n')
+        report = ImportReport()
+
+        self.assertEqual(list(read_rows(path, report=report)), [
+            (1, {"name": "The Owl"}),
+            (5, {"name": "Café Ü", "genres": ["Jazz"]})
+        ])
+        self.assertEqual([rejected["line"] for rejected in report.rejected], [3, 4])
+        self.assertIn('expected a JSON object, got list', report.rejected[1]["errors"]["json"][0])
+
+    def test_bad_ndjson_line_raises_without_a_report(self):
+        path = self.write('venues.ndjson', '{"name": "The Owl"}\n42\n')
+        with self.assertRaisesRegex(ValueError, 'line 2'):
+            list(read_rows(path))
+
+    def test_reads_csv_by_extension_numbering_lines_after_the_header(self):
+        path = self.write('venues.csv', 'name,genres\nThe Owl,Jazz;Blues\n"Hall, The",\n')
+        self.assertEqual(list(read_rows(path)), [
+            (2, {"name": "The Owl", "genres": "Jazz;Blues"}),
+            (3, {"name": "Hall, The", "genres": ""})
+        ])
+
+    def test_format_overrides_the_extension(self):
+        path = self.write('venues.txt', 'name\nThe Owl\n')
+        self.assertEqual(list(read_rows(path, 'csv')), [(2, {"name": "The Owl"})])
+
+
+class HelpersTest(unittest.TestCase):
+
+    def test_chunked(self):
+        self.assertEqual(list(chunked(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(chunked([], 3)), [])
+
+    def test_split_list(self):
+        self.assertEqual(split_list('Jazz; Blues;;'), ['Jazz', 'Blues'])
+        self.assertEqual(split_list(['Jazz']), ['Jazz'])
+        self.assertEqual(split_list(None), [])
+        self.assertEqual(split_list(''), [])
+
+    def test_parse_bool(self):
+        for value in (True, 'yes', 'TRUE', ' 1 ', 't'):
+            self.assertIs(parse_bool(value), True, value)
+        for value in (False, None, '', 'no', '0'):
+            self.assertIs(parse_bool(value), False, value)
+
+
+class ImportReportTest(unittest.TestCase):
+
+    def test_writes_rejects_as_ndjson(self):
+        report = ImportReport()
+        report.accepted = 2
+        report.reject(3, {"name": ["This field is required."]})
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'rejects.ndjson')
+        report.write_rejects(path)
+
+        with open(path, encoding='utf-8') as file:
+            self.assertEqual([json.loads(line) for line in file], [{"line": 3, "errors": {"name": ["This field is required."]}}])
+        self.assertTrue(report.summary().startswith('2 rows imported, 1 rejected in '))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""datetime_format.DateTimeFormatter against babel.dates.format_datetime.
+
+    $ python -m pytest tests
+"""
+import datetime
+import unittest
+
+import babel.dates
+
+from datetime_format import NAMED_FORMATS, DateTimeFormatter, parse_datetime
+
+STARTED = '2026-05-01T20:30:00+00:00'
+
+
+class DateTimeFormatterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.formatter = DateTimeFormatter('en_US')
+
+    def test_named_formats(self):
+        self.assertEqual(self.formatter.format(STARTED, 'full'), 'Friday May, 1, 2026 at 8:30PM')
+        self.assertEqual(self.formatter.format(STARTED), 'Fri 05, 01, 2026 8:30PM')
+
+    def test_matches_babel(self):
+        value = parse_datetime(STARTED)
+        for format, locale in (('full', None), ('medium', 'de_DE'), ('d MMM y HH:mm zzz', 'fr_FR')):
+            with self.subTest(format=format, locale=locale):
+                self.assertEqual(
+                    self.formatter.format(STARTED, format, locale),
+                    babel.dates.format_datetime(value, NAMED_FORMATS.get(format, format), locale=locale or 'en_US')
+                )
+
+    def test_naive_times_are_utc(self):
+        self.assertEqual(self.formatter.format(datetime.datetime(2026, 5, 1, 20, 30)), self.formatter.format(STARTED))
+
+    def test_converts_to_the_configured_timezone(self):
+        formatter = DateTimeFormatter('en_US', 'America/New_York')
+        self.assertEqual(formatter.format(STARTED, 'full'), 'Friday May, 1, 2026 at 4:30PM')
+        # Daylight saving time ends on November 1
+        self.assertEqual(formatter.format('2026-11-02T20:30:00Z', 'HH:mm'), '15:30')
+
+    def test_format_many_formats_each_distinct_value_once(self):
+        values = [STARTED, '2026-05-02T20:30:00Z', STARTED]
+        formatted = self.formatter.format_many(values, 'yyyy-MM-dd')
+        self.assertEqual(formatted, ['2026-05-01', '2026-05-02', '2026-05-01'])
+        self.assertEqual(self.formatter.format.cache_info().misses, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
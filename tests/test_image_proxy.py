@@ -0,0 +1,253 @@
+"""image_proxy and /thumbnails against a stand-in image host on 127.0.0.1.
+
+    $ python -m pytest tests
+"""
+import http.server
+import io
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import images
+import image_proxy
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+BOX = (64, 48)
+
+
+def png(width=400, height=300):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(output, 'PNG')
+    return output.getvalue()
+
+
+class StandInHost:
+    """Threaded HTTP server answering routes {path: (status, content type, body)}, slowly."""
+
+    def __init__(self, routes, delay=0.2):
+        self.routes = routes
+        self.delay = delay
+        self.requests = []
+        host = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                host.requests.append((self.path, self.headers['Host']))
+                time.sleep(host.delay)
+                status, content_type, body = host.routes.get(self.path, (404, 'text/plain', b'not found'))
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, path, host='127.0.0.1'):
+        return f"http://{host}:{self.port}{path}"
+
+    def hits(self, path):
+        return sum(1 for requested, _ in self.requests if requested == path)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def allow_all(url):
+    return True
+
+
+@unittest.skipUnless(Image is not None and 'jpeg' in images.available_formats(), 'needs Pillow')
+class ImageProxyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.host = StandInHost({
+            '/a.png': (200, 'image/png', png()),
+            '/page': (200, 'text/html', b'<html></html>'),
+            '/broken': (500, 'text/plain', b'oops')
+        })
+        self.proxy = image_proxy.ImageProxy(self.directory, 10 * 1024 * 1024, timeout=5, allow_private=True)
+
+    def tearDown(self):
+        self.host.close()
+        shutil.rmtree(self.directory)
+
+    def test_concurrent_requests_share_one_fetch(self):
+        url = self.host.url('/a.png')
+        results = []
+
+        def request():
+            results.append(self.proxy.thumbnail(url, BOX, 'jpeg', allow_all))
+
+        threads = [threading.Thread(target=request) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.host.hits('/a.png'), 1)
+        self.assertEqual(len(set(results)), 1)
+        self.assertGreater(self.proxy.as_dict()['coalesced'], 0)
+        with Image.open(results[0]) as thumbnail:
+            self.assertEqual(thumbnail.size, (64, 48))
+
+    def test_hit_is_served_from_disk(self):
+        url = self.host.url('/a.png')
+        path = self.proxy.thumbnail(url, BOX, 'jpeg', allow_all)
+
+        # A fresh proxy over the same directory, as after a restart
+        restarted = image_proxy.ImageProxy(self.directory, 10 * 1024 * 1024, allow_private=True)
+        self.assertEqual(restarted.thumbnail(url, BOX, 'jpeg', allow_all), path)
+        self.assertEqual(restarted.stats.hits, 1)
+        # Another size is resized from the stored original
+        restarted.thumbnail(url, (32, 24), 'jpeg', allow_all)
+        self.assertEqual(self.host.hits('/a.png'), 1)
+
+    def test_disallowed_url_is_not_fetched(self):
+        with self.assertRaises(image_proxy.ImageNotAllowed):
+            self.proxy.thumbnail(self.host.url('/a.png'), BOX, 'jpeg', lambda url: False)
+        self.assertEqual(self.host.requests, [])
+
+    def test_private_addresses_are_refused(self):
+        proxy = image_proxy.ImageProxy(self.directory, 10 * 1024 * 1024, timeout=5)
+        for host in ('127.0.0.1', 'localhost'):
+            with self.assertRaisesRegex(image_proxy.FetchError, 'non-public'):
+                proxy.thumbnail(self.host.url('/a.png', host), BOX, 'jpeg', allow_all)
+        self.assertEqual(self.host.requests, [])
+
+    def test_connects_to_the_checked_address(self):
+        getaddrinfo = socket.getaddrinfo
+        lookups = []
+
+        def stand_in_dns(host, *args, **kwargs):
+            if host == 'images.example':
+                lookups.append(host)
+                host = '127.0.0.1'
+            return getaddrinfo(host, *args, **kwargs)
+
+        with mock.patch('socket.getaddrinfo', stand_in_dns):
+            image_proxy.fetch(self.host.url('/a.png', 'images.example'), timeout=5, allow_private=True)
+        self.assertEqual(lookups, ['images.example'])
+        self.assertEqual(self.host.requests, [('/a.png', f'images.example:{self.host.port}')])
+
+    def test_original_evicted_right_after_its_lookup(self):
+        url = self.host.url('/a.png')
+        self.proxy.original(url, allow_all)
+        utime = os.utime
+
+        def touch_then_evict(path, *args, **kwargs):
+            utime(path, *args, **kwargs)
+            os.remove(path)
+
+        with mock.patch('os.utime', touch_then_evict):
+            path = self.proxy.thumbnail(url, BOX, 'jpeg', allow_all)
+        with Image.open(path) as thumbnail:
+            self.assertEqual(thumbnail.size, (64, 48))
+
+    def test_origin_errors_are_remembered(self):
+        for path in ('/broken', '/page', '/missing'):
+            url = self.host.url(path)
+            for _ in range(2):
+                with self.assertRaises(image_proxy.FetchError):
+                    self.proxy.thumbnail(url, BOX, 'jpeg', allow_all)
+            self.assertEqual(self.host.hits(path), 1)
+
+
+class DiskCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_evicts_least_recently_used(self):
+        cache = image_proxy.DiskCache(self.directory, 10000)
+        for number in range(20):
+            cache.put(f'key{number}', b'x' * 1000)
+            time.sleep(0.01)
+            cache.get('key0')
+
+        self.assertLessEqual(sum(size for _, _, size in cache._files()), 10000)
+        self.assertIsNotNone(cache.peek('key0'))
+        self.assertIsNone(cache.peek('key1'))
+        self.assertGreater(cache.stats.evictions, 0)
+
+
+@unittest.skipUnless(Image is not None and 'jpeg' in images.available_formats(), 'needs Pillow')
+class ThumbnailRouteTest(unittest.TestCase):
+
+    def setUp(self):
+        import app
+        self.directory = tempfile.mkdtemp()
+        self.host = StandInHost({
+            '/a.png': (200, 'image/png', png()),
+            '/broken': (500, 'text/plain', b'oops')
+        }, delay=0)
+        self.app = app.create_app(overrides={
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'SQLALCHEMY_ENGINE_OPTIONS': {},
+            'DB_REPLICA_URIS': [],
+            'SEARCH_BACKEND': 'postgres',
+            'THUMBNAIL_CACHE_DIR': self.directory,
+            'THUMBNAIL_ALLOW_PRIVATE_HOSTS': True
+        })
+        self.client = self.app.test_client()
+        self.catalog = {self.host.url('/a.png'), self.host.url('/broken')}
+        patcher = mock.patch.object(app, 'catalog_image', lambda url: url in self.catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.host.close()
+        shutil.rmtree(self.directory)
+
+    def thumbnail(self, path, **headers):
+        return self.client.get('/thumbnails/tile', query_string={'url': self.host.url(path)}, headers=headers)
+
+    def test_serves_cacheable_thumbnails(self):
+        response = self.thumbnail('/a.png', Accept='image/webp,*/*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/webp')
+        self.assertIn('max-age=', response.headers['Cache-Control'])
+        self.assertIn('Accept', response.vary)
+
+        repeat = self.thumbnail('/a.png', Accept='image/webp,*/*', **{'If-None-Match': response.headers['ETag']})
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(self.thumbnail('/a.png', Accept='image/png').mimetype, 'image/jpeg')
+        self.assertEqual(self.host.hits('/a.png'), 1)
+
+    def test_url_outside_the_catalog_is_404(self):
+        self.assertEqual(self.thumbnail('/elsewhere.png').status_code, 404)
+        self.assertEqual(self.host.requests, [])
+
+    def test_unknown_size_is_404(self):
+        response = self.client.get('/thumbnails/huge', query_string={'url': self.host.url('/a.png')})
+        self.assertEqual(response.status_code, 404)
+
+    def test_origin_error_redirects_to_the_original(self):
+        response = self.thumbnail('/broken')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.headers['Location'], self.host.url('/broken'))
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=60')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""metrics counters, histograms and their Prometheus text rendering.
+
+    $ python -m pytest tests
+"""
+import gc
+import threading
+import unittest
+
+import metrics
+
+
+def run_in_threads(function, count=8):
+    threads = [threading.Thread(target=function) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class CounterTest(unittest.TestCase):
+
+    def test_sums_every_threads_increments(self):
+        counter = metrics.Counter('requests_total', 'Requests.', ('route',))
+
+        def increment():
+            for _ in range(1000):
+                counter.inc('venues')
+            counter.inc('shows', amount=2)
+
+        run_in_threads(increment)
+        counter.inc('venues')
+        self.assertEqual(list(counter.samples()), [
+            ('requests_total', {'route': 'shows'}, 16),
+            ('requests_total', {'route': 'venues'}, 8001)
+        ])
+
+    def test_ended_threads_are_folded_into_the_total(self):
+        counter = metrics.Counter('requests_total', 'Requests.')
+        run_in_threads(counter.inc)
+        gc.collect()
+        self.assertEqual(len(counter._values._shards), 0)
+        self.assertEqual(list(counter.samples()), [('requests_total', {}, 8)])
+
+    def test_gauge_goes_down(self):
+        gauge = metrics.Gauge('in_flight', 'In flight.')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        self.assertEqual(list(gauge.samples()), [('in_flight', {}, 1)])
+
+
+class HistogramTest(unittest.TestCase):
+
+    def test_buckets_are_cumulative_and_inclusive(self):
+        histogram = metrics.Histogram('seconds', 'Seconds.', ('route',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, 'venues')
+
+        self.assertEqual(list(histogram.samples()), [
+            ('seconds_bucket', {'route': 'venues', 'le': '0.1'}, 2),
+            ('seconds_bucket', {'route': 'venues', 'le': '1.0'}, 3),
+            ('seconds_bucket', {'route': 'venues', 'le': '+Inf'}, 4),
+            ('seconds_count', {'route': 'venues'}, 4),
+            ('seconds_sum', {'route': 'venues'}, 3.65)
+        ])
+
+
+class RegistryTest(unittest.TestCase):
+
+    def test_renders_the_text_format(self):
+        registry = metrics.Registry()
+        counter = registry.register(metrics.Counter('requests_total', 'Requests.', ('path',)))
+        registry.register(metrics.Callback('up', 'Up.', 'gauge', (), lambda: {(): True}))
+        counter.inc('/say "hi"\\\n')
+
+        self.assertEqual(registry.render(), (
+            '# HELP requests_total Requests.\n'
+            '# TYPE requests_total counter\n'
+            'requests_total{path="/say \\"hi\\"\\\\\\n"} 1\n'
+            '# HELP up Up.\n'
+            '# TYPE up gauge\n'
+            'up 1\n'
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,228 @@
+"""Query budgets per route, checked against two catalog sizes.
+
+Seeds a small and a ten times larger catalog in turn and, for every read
+route, checks the SQL statement count and DB time of an uncached request
+against its budget. A route fails too when its statement count grows with
+the catalog, the signature of an N+1 loop.
+
+The catalogs load into a temporary SQLite database. Tests marked postgres
+check the same budgets on PostgreSQL, as migrated: a throwaway local server
+(testing.postgresql, from requirements-extra.txt, and the PostgreSQL
+binaries), or the scratch database in FYYUR_BUDGETS_DATABASE_URL, which is
+wiped. They are skipped when neither is available.
+
+    $ python -m pytest tests/test_query_budgets.py
+    $ FYYUR_BUDGETS_DATABASE_URL=postgresql://localhost/fyyur_budgets python -m pytest tests -m postgres
+"""
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+import pytest
+from flask_migrate import upgrade
+from sqlalchemy import ARRAY, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+
+from app import create_app, db
+from benchmarks import generator, harness
+import sql_profile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (venues, artists, shows) of each catalog the budgets are checked against
+SIZES = {
+    "small": (50, 200, 2000),
+    "large": (500, 2000, 20000)
+}
+
+# Most statements and milliseconds of DB time per uncached request
+QUERY_BUDGETS = {
+    "index": (0, 0),
+    "venues": (1, 100),
+    "search_venues": (1, 100),
+    "show_venue": (4, 50),
+    "create_venue_form": (0, 0),
+    "edit_venue": (1, 20),
+    "artists": (1, 100),
+    "search_artists": (1, 100),
+    "show_artist": (4, 50),
+    "edit_artist": (1, 20),
+    "create_artist_form": (0, 0),
+    "shows": (1, 500),
+    "create_shows": (2, 100),
+    "api_venues": (1, 50),
+    "api_artists": (1, 50),
+    "api_shows": (1, 50),
+    "api_export_venues": (1, 100),
+    "api_venue": (4, 50),
+    "api_artist": (4, 50),
+    "cache_stats": (0, 0),
+    "pool_stats": (0, 0),
+    "metrics": (0, 0)
+}
+
+# Requests measured per route and size; the worst one counts
+RUNS = 3
+
+
+@compiles(ARRAY, 'sqlite')
+def _array_on_sqlite(type_, compiler, **kwargs):
+    # SQLite has no arrays; genres are kept as JSON text
+    return 'JSON'
+
+
+sqlite3.register_adapter(list, json.dumps)
+
+
+class StatementRecorder:
+    """RequestProfile of every statement run between start() and stop(), streamed bodies included."""
+
+    def __init__(self):
+        self.profile = sql_profile.RequestProfile()
+
+    def start(self):
+        self.profile = sql_profile.RequestProfile()
+        event.listen(Engine, 'before_cursor_execute', self._before)
+        event.listen(Engine, 'after_cursor_execute', self._after)
+
+    def stop(self):
+        event.remove(Engine, 'before_cursor_execute', self._before)
+        event.remove(Engine, 'after_cursor_execute', self._after)
+        return self.profile
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('budget_started', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['budget_started'].pop()
+        self.profile.record(sql_profile.normalize(statement), time.perf_counter() - started)
+
+
+def measure(app, scenario_list):
+    """{scenario name: (worst statement count, worst DB ms, status, profile of the worst run)}."""
+    driver = harness.ClientDriver(app)
+    recorder = StatementRecorder()
+    measured = {}
+    for scenario in scenario_list:
+        # Warm-up, so one-off work like dialect initialization isn't counted
+        driver.send(scenario)
+        worst = None
+        for _ in range(RUNS):
+            recorder.start()
+            try:
+                _, status, _ = driver.send(scenario)
+            finally:
+                profile = recorder.stop()
+            if worst is None or (profile.count, profile.seconds) > (worst[3].count, worst[3].seconds):
+                worst = (profile.count, profile.seconds * 1000, status, profile)
+        measured[scenario.name] = worst
+    return measured
+
+
+def measure_sizes(app):
+    """{size: measure() output} over a freshly seeded catalog of each of SIZES."""
+    results = {}
+    for size, (venues, artists, shows) in SIZES.items():
+        with app.app_context():
+            generator.clear_catalog(db.session)
+            generator.seed_catalog(db.session, venues, artists, shows)
+            sample = harness.sample_catalog()
+            db.session.remove()
+        scenario_list = [scenario for scenario in harness.scenarios(sample) if scenario.name in QUERY_BUDGETS]
+        results[size] = measure(app, scenario_list)
+
+    with app.app_context():
+        db.engine.dispose()
+    return results
+
+
+def budget_app(database_url, **overrides):
+    return create_app(overrides=dict({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'DB_REPLICA_URIS': [],
+        'CACHE_TTL': 0,
+        'SQL_WARN_STATEMENTS': None,
+        'SQL_WARN_DB_MS': None,
+        'SQL_WARN_REPEATS': None,
+        'PROPAGATE_EXCEPTIONS': False
+    }, **overrides))
+
+
+class QueryBudgetChecks:
+    """Budget tests over cls.results, {size: measure() output}, set up by each database's test case."""
+
+    results = None
+
+    def test_routes_succeed(self):
+        for size, measured in self.results.items():
+            for name in QUERY_BUDGETS:
+                with self.subTest(route=name, size=size):
+                    status = measured[name][2]
+                    self.assertTrue(status is not None and status < 400, f"HTTP {status}")
+
+    def test_statement_budgets(self):
+        for size, measured in self.results.items():
+            for name, (max_statements, _) in QUERY_BUDGETS.items():
+                with self.subTest(route=name, size=size):
+                    statements, _, _, profile = measured[name]
+                    repeated = profile.repeated(2)
+                    detail = f"; repeated: {repeated[0]['statement'][:120]}" if repeated else ''
+                    self.assertLessEqual(statements, max_statements, f"{statements} statements{detail}")
+
+    def test_statements_dont_grow_with_the_catalog(self):
+        small, large = self.results['small'], self.results['large']
+        for name in QUERY_BUDGETS:
+            with self.subTest(route=name):
+                self.assertLessEqual(large[name][0], small[name][0])
+
+    def test_db_time_budgets(self):
+        for size, measured in self.results.items():
+            for name, (_, max_ms) in QUERY_BUDGETS.items():
+                if max_ms:
+                    with self.subTest(route=name, size=size):
+                        self.assertLessEqual(measured[name][1], max_ms, f"{measured[name][1]:.1f}ms in the database")
+
+
+class SQLiteQueryBudgetTest(QueryBudgetChecks, unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, directory)
+        # SQLite has no pg_trgm, so search uses the in-process index
+        app = budget_app(
+            f"sqlite:///{os.path.join(directory, 'budgets.db')}", SQLALCHEMY_ENGINE_OPTIONS={}, SEARCH_BACKEND='memory'
+        )
+        with app.app_context():
+            db.create_all()
+        cls.results = measure_sizes(app)
+
+
+@pytest.mark.postgres
+class PostgresQueryBudgetTest(QueryBudgetChecks, unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        database_url = os.environ.get('FYYUR_BUDGETS_DATABASE_URL')
+        if not database_url:
+            try:
+                import testing.postgresql
+                postgresql = testing.postgresql.Postgresql()
+            except (ImportError, RuntimeError) as error:
+                raise unittest.SkipTest(f"no PostgreSQL to check budgets on: {error}")
+            cls.addClassCleanup(postgresql.stop)
+            database_url = postgresql.url()
+
+        app = budget_app(database_url, SEARCH_BACKEND='postgres')
+        with app.app_context():
+            upgrade(directory=os.path.join(ROOT, 'migrations'))
+        cls.results = measure_sizes(app)
+
+
+if __name__ == '__main__':
+    unittest.main()
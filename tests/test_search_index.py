@@ -0,0 +1,93 @@
+"""search_index.NgramIndex against a naive substring scan over the same documents.
+
+    $ python -m pytest tests
+"""
+import random
+import unittest
+
+from search_index import NgramIndex, ngrams, similarity
+
+WORDS = ['the', 'owl', 'Owls', 'jazz', 'club', 'Cafe', 'x', 'hall', 'ROOM', 'musical', 'hop', 'o']
+
+
+def corpus(size, seed=7):
+    """{id: (name, city)} of random phrases, ids not in insertion order."""
+    rng = random.Random(seed)
+    ids = rng.sample(range(1, size * 3), size)
+    return {
+        doc_id: (' '.join(rng.choices(WORDS, k=rng.randint(1, 4))), rng.choice(['San Francisco', 'New York', '']))
+        for doc_id in ids
+    }
+
+
+def naive_search(documents, term):
+    """Ranked ids of documents with a field containing term, the way NgramIndex ranks them."""
+    term = term.lower()
+    matches = [
+        (-max(similarity(field.lower(), term) for field in fields), fields[0].lower(), doc_id)
+        for doc_id, fields in documents.items()
+        if any(term in field.lower() for field in fields)
+    ]
+    return [doc_id for _, _, doc_id in sorted(matches)]
+
+
+class NgramsTest(unittest.TestCase):
+
+    def test_pads_and_lowercases(self):
+        self.assertEqual(ngrams('Ab'), {'\x02ab', 'ab\x03'})
+        self.assertEqual(ngrams(''), {'\x02\x03'})
+
+    def test_similarity(self):
+        self.assertEqual(similarity('owl', 'OWL'), 1.0)
+        self.assertEqual(similarity('owl', 'jazz'), 0.0)
+        self.assertGreater(similarity('owl', 'owls'), similarity('owl', 'the owls club'))
+
+
+class NgramIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = corpus(500)
+        self.index = NgramIndex()
+        for doc_id, fields in self.documents.items():
+            self.index.add(doc_id, fields)
+
+    def test_matches_a_naive_search(self):
+        for term in ('owl', 'OWL', 'the', 'x', 'o', 'ow', 'jazz club', 's cl', 'san', 'york', 'zzz', ''):
+            with self.subTest(term=term):
+                expected = naive_search(self.documents, term)
+                self.assertEqual(self.index.search(term), (len(expected), expected))
+
+    def test_pages(self):
+        expected = naive_search(self.documents, 'o')
+        total, page = self.index.search('o', limit=10, offset=20)
+        self.assertEqual(total, len(expected))
+        self.assertEqual(page, expected[20:30])
+        self.assertEqual(self.index.search('o', limit=10, offset=len(expected)), (len(expected), []))
+
+    def test_add_replaces_and_remove_drops(self):
+        doc_id = next(iter(self.documents))
+        self.index.add(doc_id, ('Zebra Lounge', None))
+        self.documents[doc_id] = ('Zebra Lounge', '')
+        removed = list(self.documents)[1]
+        self.index.remove(removed)
+        del self.documents[removed]
+        self.index.remove(-1)
+
+        self.assertEqual(self.index.search('zebra'), (1, [doc_id]))
+        self.assertNotIn(removed, self.index)
+        self.assertEqual(len(self.index), len(self.documents))
+        for term in ('owl', 'the', 'x'):
+            with self.subTest(term=term):
+                expected = naive_search(self.documents, term)
+                self.assertEqual(self.index.search(term), (len(expected), expected))
+
+    def test_removing_everything_leaves_no_postings(self):
+        for doc_id in self.documents:
+            self.index.remove(doc_id)
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index._postings, {})
+        self.assertEqual(self.index.search('owl'), (0, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""sql_profile.normalize and RequestProfile, without a database.
+
+    $ python -m pytest tests
+"""
+import unittest
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+import sql_profile
+
+venue = Table('Venue', MetaData(), Column('id', Integer, primary_key=True), Column('name', String))
+
+
+def compiled(statement, dialect):
+    return str(statement.compile(dialect=dialect))
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_folds_qmark_in_lists(self):
+        self.assertEqual(
+            sql_profile.normalize('SELECT * FROM "Show" WHERE venue_id IN (?, ?, ?)'),
+            'SELECT * FROM "Show" WHERE venue_id IN (?)'
+        )
+
+    def test_folds_pyformat_in_lists(self):
+        self.assertEqual(
+            sql_profile.normalize('SELECT * FROM "Show" WHERE venue_id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)'),
+            'SELECT * FROM "Show" WHERE venue_id IN (?)'
+        )
+
+    def test_folds_format_in_lists(self):
+        self.assertEqual(
+            sql_profile.normalize('SELECT * FROM "Show" WHERE venue_id IN (%s, %s)'),
+            'SELECT * FROM "Show" WHERE venue_id IN (?)'
+        )
+
+    def test_lists_of_any_length_match_in_either_style(self):
+        for dialect in (sqlite.dialect(), postgresql.psycopg2.dialect()):
+            statements = {
+                sql_profile.normalize(compiled(select([venue.c.name]).where(venue.c.id.in_(ids)), dialect))
+                for ids in ([1], [1, 2], list(range(50)))
+            }
+            self.assertEqual(len(statements), 1, statements)
+
+    def test_folds_literals(self):
+        self.assertEqual(
+            sql_profile.normalize("SELECT id FROM \"Venue\" WHERE name = 'Jo''s'  AND id > 42 LIMIT 10"),
+            'SELECT id FROM "Venue" WHERE name = ? AND id > ? LIMIT ?'
+        )
+
+    def test_keeps_identifiers_with_digits(self):
+        self.assertEqual(
+            sql_profile.normalize('SELECT anon_1.id FROM anon_1 WHERE anon_1.id = %(id_1)s'),
+            'SELECT anon_1.id FROM anon_1 WHERE anon_1.id = ?'
+        )
+
+
+class RequestProfileTest(unittest.TestCase):
+
+    def test_groups_repeats_of_one_statement(self):
+        profile = sql_profile.RequestProfile()
+        for venue_id in range(6):
+            profile.record(sql_profile.normalize(f'SELECT * FROM "Show" WHERE venue_id = {venue_id}'), 0.002)
+        profile.record(sql_profile.normalize('SELECT * FROM "Venue"'), 0.01)
+
+        self.assertEqual(profile.count, 7)
+        self.assertAlmostEqual(profile.seconds, 0.022)
+        repeated = profile.repeated(5)
+        self.assertEqual([entry['statement'] for entry in repeated], ['SELECT * FROM "Show" WHERE venue_id = ?'])
+        self.assertEqual(repeated[0]['count'], 6)
+        self.assertEqual(profile.slowest(1)[0]['statement'], 'SELECT * FROM "Venue"')
+
+
+if __name__ == '__main__':
+    unittest.main()